@@ -1,20 +1,161 @@
 import json
+import os
+from quality import clarity, complexity, engagement, pacing
+from quality.engagement import lexicon_fingerprint
 from quality.clarity import calculate_clarity
 from quality.complexity import analyze_complexity
 from quality.engagement import analyze_engagement
 from quality.pacing import analyze_pacing
+from quality.document import LectureDocument
+from quality.streaming import DEFAULT_CHUNK_CHARS, analyze_stream
+from quality.resources import SPACY_MODEL
+from analysis.cache import (
+    content_hash,
+    make_key,
+    package_version,
+    get_default_cache,
+    stream_hash,
+)
 
+ANALYZER_NAMES = ("clr", "com", "eng", "pac")
 
-def get_analysis(file_path, pacing_word_count):
-    with open(file_path, "r", encoding="utf-8") as file:
-        content = file.read()
+# Transcripts longer than this are analyzed chunk by chunk (spaCy's default
+# max_length is 1,000,000 characters)
+STREAMING_THRESHOLD = 500_000
 
-    analysis_results = {
-        "clr": calculate_clarity(content),
-        "com": analyze_complexity(content),
-        "eng": analyze_engagement(content),
-        "pac": analyze_pacing(content, pacing_word_count),
+# Everything besides the transcript that can change an analyzer's output.
+# Bumping a module's ANALYZER_VERSION only invalidates that analyzer's cache entries.
+_TEXTSTAT = package_version("textstat")
+_NLTK = package_version("nltk")
+ANALYZER_VERSIONS = {
+    "clr": (clarity.ANALYZER_VERSION, SPACY_MODEL, _TEXTSTAT, _NLTK),
+    "com": (complexity.ANALYZER_VERSION, SPACY_MODEL, _TEXTSTAT, _NLTK),
+    "eng": (engagement.ANALYZER_VERSION, _TEXTSTAT, _NLTK),
+    "pac": (pacing.ANALYZER_VERSION, _NLTK),
+}
+
+
+def run_analyzer(name, document, duration_seconds, subject=None):
+    if name == "clr":
+        return calculate_clarity(document)
+    if name == "com":
+        return analyze_complexity(document)
+    if name == "eng":
+        return analyze_engagement(document, subject)
+    return analyze_pacing(document, duration_seconds)
+
+
+def analyze_document(document, duration_seconds, subject=None):
+    return {
+        name: run_analyzer(name, document, duration_seconds, subject)
+        for name in ANALYZER_NAMES
+    }
+
+
+def cache_keys(text_hash, duration_seconds, subject=None):
+    keys = {
+        name: make_key(text_hash, name, *versions)
+        for name, versions in ANALYZER_VERSIONS.items()
     }
+    keys["pac"] = make_key(keys["pac"], float(duration_seconds))
+    # Registering subject phrases changes engagement without a version bump
+    keys["eng"] = make_key(keys["eng"], subject, lexicon_fingerprint(subject))
+    return keys
+
+
+def lookup_cached(content, duration_seconds, cache, subject=None):
+    """Returns `(keys, cached results)` for the analyzers already in the cache."""
+    return _lookup_hash(content_hash(content), duration_seconds, cache, subject)
+
+
+def _lookup_hash(text_hash, duration_seconds, cache, subject):
+    keys = cache_keys(text_hash, duration_seconds, subject)
+    cached = {}
+    for name, key in keys.items():
+        value = cache.get(key)
+        if value is not None:
+            cached[name] = value
+    return keys, cached
+
+
+def _analyze_missing(content, duration_seconds, names, parse, streaming, subject):
+    if streaming is None:
+        streaming = parse is None and len(content) > STREAMING_THRESHOLD
+    if streaming:
+        analysis = analyze_stream(content, duration_seconds, subject=subject)
+        return {name: analysis[name] for name in names}
+    document = LectureDocument(content, parse=parse)
+    return {
+        name: run_analyzer(name, document, duration_seconds, subject) for name in names
+    }
+
+
+def analyze_text(
+    content, duration_seconds, cache=None, parse=None, streaming=None, subject=None
+):
+    """Analyzes a transcript, only running analyzers whose results are not cached.
+
+    `streaming=None` switches to chunked analysis for very long transcripts.
+    `subject` adds that subject's registered engagement phrases.
+    """
+    if cache is None:
+        return _analyze_missing(
+            content, duration_seconds, ANALYZER_NAMES, parse, streaming, subject
+        )
+
+    keys, results = lookup_cached(content, duration_seconds, cache, subject)
+    missing = [name for name in ANALYZER_NAMES if name not in results]
+    if missing:
+        computed = _analyze_missing(
+            content, duration_seconds, missing, parse, streaming, subject
+        )
+        for name in missing:
+            results[name] = computed[name]
+            cache.put(keys[name], computed[name])
+    return {name: results[name] for name in ANALYZER_NAMES}
+
+
+def _read_blocks(file):
+    return iter(lambda: file.read(DEFAULT_CHUNK_CHARS), "")
+
+
+def analyze_file_stream(file_path, duration_seconds, cache=None, subject=None):
+    """Chunked analysis of a transcript file without reading it into memory."""
+    keys, results = {}, {}
+    if cache is not None:
+        with open(file_path, "r", encoding="utf-8") as file:
+            text_hash = stream_hash(_read_blocks(file))
+        keys, results = _lookup_hash(text_hash, duration_seconds, cache, subject)
+    missing = [name for name in ANALYZER_NAMES if name not in results]
+    if missing:
+        with open(file_path, "r", encoding="utf-8") as file:
+            computed = analyze_stream(file, duration_seconds, subject=subject)
+        for name in missing:
+            results[name] = computed[name]
+            if cache is not None:
+                cache.put(keys[name], computed[name])
+    return {name: results[name] for name in ANALYZER_NAMES}
+
+
+def get_analysis(
+    file_path, pacing_word_count, use_cache=True, streaming=None, subject=None
+):
+    cache = get_default_cache() if use_cache else None
+    if streaming is None:
+        # Bytes, not characters, but close enough to pick a mode
+        streaming = os.path.getsize(file_path) > STREAMING_THRESHOLD
+    if streaming:
+        analysis_results = analyze_file_stream(
+            file_path, pacing_word_count, cache=cache, subject=subject
+        )
+    else:
+        with open(file_path, "r", encoding="utf-8") as file:
+            content = file.read()
+
+        # Tokenize and parse once, then share the document across all analyzers
+        analysis_results = analyze_text(
+            content, pacing_word_count, cache=cache, streaming=False, subject=subject
+        )
 
     result_file_path = "analysis_results.json"
     with open(result_file_path, "w", encoding="utf-8") as result_file:
@@ -23,5 +164,6 @@ def get_analysis(file_path, pacing_word_count):
     return analysis_results
 
 
-results = get_analysis("sci_2.txt", 1314)
-print(results)
+if __name__ == "__main__":
+    results = get_analysis("sci_2.txt", 1314)
+    print(results)
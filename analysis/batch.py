@@ -0,0 +1,218 @@
+"""
+Batch analysis over many lecture transcripts.
+
+Transcripts are streamed through spaCy's nlp.pipe (parsing is the dominant
+cost), and the tokenizing/textstat work for each parsed lecture is fanned out
+over a process pool. One JSON line is written per lecture as soon as it
+finishes, so memory stays bounded by the number of lectures in flight rather
+than the size of the backlog.
+
+Input is either a directory of `<name>.txt` transcripts with a sibling
+`<name>.vtt` (the duration is the end of the last caption), or a JSON Lines
+manifest with one `{"path": ..., "duration": ...}` record per lecture (plus an
+optional "subject" for the engagement phrases).
+
+Usage: python -m analysis.batch lectures/ -o results.jsonl
+
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from analysis.analysis import (
+    analyze_text,
+    lookup_cached,
+    ANALYZER_NAMES,
+    STREAMING_THRESHOLD,
+)
+from analysis.cache import DEFAULT_CACHE_DIR, get_cache
+from audio_files.vtt_convert import iter_captions
+from quality.document import parse_summary
+from quality.engagement import LEXICON_FILE_ENV
+from quality.resources import get_nlp
+
+
+def vtt_duration(vtt_path):
+    """Returns the end time of the last caption in seconds."""
+    last_end = None
+    for caption in iter_captions(vtt_path):
+        last_end = caption["end"]
+    return last_end
+
+
+def iter_lectures(source, subject=None):
+    """Yields one `{"id", "path", "duration", "subject"}` record per lecture in
+    `source`; `subject` is the default for lectures that do not name one."""
+    if os.path.isdir(source):
+        for path in sorted(glob.glob(os.path.join(source, "*.txt"))):
+            vtt_path = os.path.splitext(path)[0] + ".vtt"
+            duration = vtt_duration(vtt_path) if os.path.exists(vtt_path) else None
+            yield {
+                "id": os.path.splitext(os.path.basename(path))[0],
+                "path": path,
+                "duration": duration,
+                "subject": subject,
+            }
+        return
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, "r", encoding="utf-8") as manifest:
+        for line in manifest:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            path = os.path.join(base_dir, entry["path"])
+            yield {
+                "id": entry.get("id", os.path.splitext(os.path.basename(path))[0]),
+                "path": path,
+                "duration": entry.get("duration"),
+                "subject": entry.get("subject", subject),
+            }
+
+
+def _read_transcripts(lectures, emit, submit_unparsed, cache):
+    """Yields `(text, lecture)` pairs that still need parsing.
+
+    Lectures that fail to load or are fully cached are passed to `emit` instead,
+    and transcripts too long to parse in one piece go to `submit_unparsed`.
+    """
+    for lecture in lectures:
+        if lecture["duration"] is None:
+            emit([{**lecture, "error": "missing duration"}])
+            continue
+        try:
+            with open(lecture["path"], "r", encoding="utf-8") as file:
+                text = file.read()
+        except OSError as e:
+            emit([{**lecture, "error": str(e)}])
+            continue
+        if cache is not None:
+            # Fully cached lectures skip parsing and the process pool entirely
+            _, cached = lookup_cached(
+                text, lecture["duration"], cache, lecture["subject"]
+            )
+            if len(cached) == len(ANALYZER_NAMES):
+                analysis = {name: cached[name] for name in ANALYZER_NAMES}
+                emit([{**lecture, "analysis": analysis}])
+                continue
+        if len(text) > STREAMING_THRESHOLD:
+            # Analyzed chunk by chunk inside the worker instead of by nlp.pipe
+            submit_unparsed(lecture, text)
+            continue
+        yield text, lecture
+
+
+def _analyze_lecture(lecture, text, parse, cache_dir):
+    try:
+        cache = get_cache(cache_dir) if cache_dir else None
+        analysis = analyze_text(
+            text,
+            lecture["duration"],
+            cache=cache,
+            parse=parse,
+            subject=lecture["subject"],
+        )
+        return {**lecture, "analysis": analysis}
+    except Exception as e:
+        return {**lecture, "error": f"{type(e).__name__}: {e}"}
+
+
+def run_batch(
+    source,
+    output_path,
+    n_process=None,
+    batch_size=4,
+    workers=None,
+    max_pending=None,
+    cache_dir=DEFAULT_CACHE_DIR,
+    subject=None,
+):
+    """Analyzes every lecture in `source`, appending one JSON line per lecture.
+
+    Pass `cache_dir=None` to bypass the analysis cache. Returns the number of
+    records written.
+    """
+    cpu_count = os.cpu_count() or 1
+    # Parsing and the per-lecture NLTK/textstat work are both CPU bound; split
+    # the cores between them unless told otherwise.
+    n_process = n_process or max(1, cpu_count // 2)
+    workers = workers or max(1, cpu_count - n_process)
+    max_pending = max_pending or workers * 2
+
+    written = 0
+    pending = set()
+    cache = get_cache(cache_dir) if cache_dir else None
+
+    def write(records):
+        nonlocal written
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            written += 1
+        out.flush()
+
+    def submit(lecture, text, parse=None):
+        nonlocal pending
+        pending.add(pool.submit(_analyze_lecture, lecture, text, parse, cache_dir))
+        if len(pending) >= max_pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            write(future.result() for future in done)
+
+    # Workers start on the first submit, after spaCy's pipe has started its
+    # queue feeder threads; spawning avoids forking a multi-threaded process
+    with open(output_path, "a", encoding="utf-8") as out, ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        docs = get_nlp().pipe(
+            _read_transcripts(iter_lectures(source, subject), write, submit, cache),
+            as_tuples=True,
+            n_process=n_process,
+            batch_size=batch_size,
+        )
+        for doc, lecture in docs:
+            submit(lecture, doc.text, parse_summary(doc))
+
+        write(future.result() for future in wait(pending).done)
+
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze many lecture transcripts.")
+    parser.add_argument(
+        "source", help="directory of .txt/.vtt pairs or a JSONL manifest"
+    )
+    parser.add_argument("-o", "--output", default="analysis_results.jsonl")
+    parser.add_argument("--n-process", type=int, default=None, help="spaCy processes")
+    parser.add_argument("--batch-size", type=int, default=4, help="spaCy batch size")
+    parser.add_argument("--workers", type=int, default=None, help="analysis processes")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--subject", help="default subject for engagement phrases")
+    parser.add_argument(
+        "--lexicon",
+        help="JSON file of subject engagement phrases (SUBJECT_LEXICON_FILE)",
+    )
+    args = parser.parse_args(argv)
+    if args.lexicon:
+        # Set before the worker pools start, so they inherit it
+        os.environ[LEXICON_FILE_ENV] = os.path.abspath(args.lexicon)
+
+    count = run_batch(
+        args.source,
+        args.output,
+        n_process=args.n_process,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        subject=args.subject,
+    )
+    print(f"Wrote {count} lecture records to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
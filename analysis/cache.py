@@ -0,0 +1,163 @@
+"""
+On-disk cache of analyzer results.
+
+Entries are keyed by the transcript content hash plus everything that can
+change an analyzer's output (its own version, the spaCy model, textstat/NLTK
+versions, and for pacing the duration). Each analyzer has its own entry, so
+bumping one analyzer's version only invalidates that analyzer's results.
+
+Writes are atomic (temp file + rename) and the cache is bounded by size,
+evicting least recently used entries first.
+
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from functools import lru_cache
+from importlib.metadata import version, PackageNotFoundError
+
+DEFAULT_CACHE_DIR = os.environ.get("ANALYSIS_CACHE_DIR", ".analysis_cache")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def package_version(name):
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def stream_hash(pieces):
+    """content_hash of the concatenated `pieces`, e.g. blocks read from a file."""
+    digest = hashlib.sha256()
+    for piece in pieces:
+        digest.update(piece.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def write_atomic(path, write, binary=False):
+    """Calls `write(file)` on a temp file next to `path`, then renames it over
+    `path`; the temp file never outlives a failed write."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        if binary:
+            f = os.fdopen(fd, "wb")
+        else:
+            f = os.fdopen(fd, "w", encoding="utf-8")
+        with f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json_atomic(data, path):
+    write_atomic(path, lambda f: json.dump(data, f, ensure_ascii=False))
+
+
+def make_key(*parts):
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode()).hexdigest()
+
+
+class AnalysisCache:
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = None  # key -> (size, last access time)
+        self._total_bytes = 0
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key + ".json")
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+        self._index = {}
+        self._total_bytes = 0
+        if not os.path.isdir(self.root):
+            return
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith(".json"):
+                    continue
+                stat = entry.stat()
+                self._index[entry.name[:-5]] = (stat.st_size, stat.st_mtime)
+                self._total_bytes += stat.st_size
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                value = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        # The file mtime doubles as the LRU access time
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            if self._index is not None and key in self._index:
+                self._index[key] = (self._index[key][0], os.path.getmtime(path))
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        write_atomic(path, lambda f: f.write(data), binary=True)
+
+        with self._lock:
+            self._load_index()
+            old_size = self._index.get(key, (0, 0))[0]
+            self._index[key] = (len(data), os.path.getmtime(path))
+            self._total_bytes += len(data) - old_size
+            self._evict()
+
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            del self._index[key]
+            self._total_bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._load_index()
+            for key in list(self._index):
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+            self._index = {}
+            self._total_bytes = 0
+
+
+@lru_cache(maxsize=None)
+def get_cache(root=DEFAULT_CACHE_DIR):
+    """One AnalysisCache per directory per process, so the directory is only
+    scanned into an index once rather than once per lecture."""
+    return AnalysisCache(root)
+
+
+def get_default_cache():
+    return get_cache(DEFAULT_CACHE_DIR)
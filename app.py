@@ -1,11 +1,48 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Union
-from groq import Groq
+from typing import Dict, List, Optional, Union
+from groq import APIError, APITimeoutError
+from lecture_store import LectureStore
+from llm import StreamMetrics, get_llm_client, close_clients
+from prompt import build_messages, compile_prompt
+from response_cache import ResponseCache
+from upload.chunked import BackgroundIngest, UploadError, UploadManager
 
-app = FastAPI()
 
-client = Groq(api_key="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")
+@asynccontextmanager
+async def lifespan(app):
+    # Files left queued or mid-analysis by the previous run
+    uploads.resume_ingest()
+    yield
+    await close_clients()
+    upload_ingest.close(timeout=5)
+    lecture_store.close()
+
+
+app = FastAPI(lifespan=lifespan)
+response_cache = ResponseCache()
+lecture_store = LectureStore()
+stream_metrics = StreamMetrics()
+uploads = UploadManager()
+upload_ingest = BackgroundIngest(uploads, lecture_store)
+uploads.on_complete = upload_ingest.submit
+
+MODEL_PARAMS = {
+    "model": "llama-3.3-70b-versatile",
+    "temperature": 0.7,
+    "max_tokens": 1024,
+    "top_p": 1,
+}
+
+# Per-quiz parallelism; LLMClient also bounds upstream calls across all requests
+QUIZ_CONCURRENCY = int(os.environ.get("QUIZ_CONCURRENCY", "8"))
+MAX_QUIZ_QUESTIONS = int(os.environ.get("MAX_QUIZ_QUESTIONS", "200"))
 
 
 # Define Pydantic models for request validation
@@ -16,83 +53,263 @@ class LectureAnalysis(BaseModel):
     pac: Dict[str, Union[float, str, list]]
 
 
-class ChatRequest(BaseModel):
+class LectureRegistration(BaseModel):
+    analysis: LectureAnalysis
+    title: Optional[str] = None
+
+
+# Send either a registered lecture_id or the full analysis
+class LectureReference(BaseModel):
+    lecture_id: Optional[str] = None
+    analysis: Optional[LectureAnalysis] = None
+
+
+class ChatRequest(LectureReference):
     user_id: str
     question: str
-    analysis: LectureAnalysis
 
 
-def generate_mimic_response(question: str, lecture_stats: dict) -> str:
-    system_prompt = f"""
-        You are an AI that mimics a student who has attended the given lecture. Your understanding is shaped entirely by how the teacher taught: their **clarity**, **complexity**, **engagement**, and **pacing**.  
+class QuizRequest(LectureReference):
+    user_id: str
+    questions: List[str]
+    concurrency: Optional[int] = None
 
-        You are now answering **test questions** based on what you learned in that lecture.  
-        **DO NOT use outside knowledge. Only respond based on how well the teacher explained it.**
 
-        ---
+# sha256 is optional; a known hash finishes the upload without sending any bytes
+class UploadCreation(BaseModel):
+    filename: str
+    size: int
+    title: Optional[str] = None
+    sha256: Optional[str] = None
 
-        ### Lecture Teaching Style:
-        - **Clarity:** {lecture_stats['clr']}
-        - **Complexity:** {lecture_stats['com']}
-        - **Engagement:** {lecture_stats['eng']}
-        - **Pacing:** {lecture_stats['pac']}
 
-        ---
+def resolve_analysis(request: LectureReference) -> dict:
+    if request.lecture_id is not None:
+        analysis = lecture_store.get(request.lecture_id)
+        if analysis is None:
+            raise HTTPException(
+                status_code=404, detail=f"Unknown lecture_id {request.lecture_id}"
+            )
+        return analysis
+    if request.analysis is None:
+        raise HTTPException(
+            status_code=422, detail="Either lecture_id or analysis is required"
+        )
+    return request.analysis.dict()
 
-        ### How Your Answers Should Reflect the Teaching:
 
-        **1. Realistic Student Understanding:**
-        - Complex words + clear examples → You partially understand; refer to examples.
-        - Complex words + no examples → You struggle or misinterpret.
-        - Low clarity + fast pacing → Your answer is rushed, vague, or confused.
-        - Moderate clarity + high engagement → You get some things, but miss others.
+async def generate_mimic_response(question: str, lecture_stats: dict) -> str:
+    cached, cache_key = await response_cache.get(question, lecture_stats)
+    if cached is not None:
+        return cached
 
-        **2. Match the Teacher’s Style:**
-        - If they repeated certain phrases → You repeat them too.
-        - If they used analogies → You use the same ones. If not → Don’t invent any.
-        - If engagement was high → Sound excited, maybe ask rhetorical questions or mention jokes.
-        - If engagement was low → You sound bored, detached, or give minimal effort.
+    started = time.perf_counter()
+    response = await get_llm_client().chat(
+        messages=build_messages(lecture_stats, question), **MODEL_PARAMS
+    )
+    await response_cache.put(cache_key, response, time.perf_counter() - started)
+    return response
 
-        **3. Combine Pacing + Complexity:**
-        - Fast + complex → You mix up or confuse ideas.
-        - Slow + clear → Your answer is structured and clear.
-        - Fast + clear → You get the gist, but leave out details.
 
-        **4. Do NOT Make Up Info:**
-        - If they skipped an explanation → You admit you didn’t get it.
-        - If a term wasn’t explained → You stay confused or unsure.
-        - If no examples were given → Don’t invent one; say so.
+def sse_event(data, event=None):
+    message = f"data: {json.dumps(data)}\n\n"
+    return f"event: {event}\n{message}" if event else message
 
-        ---
 
-        ** Final Rules:**
-        - Answer each **test question** as a student would—based ONLY on how the topic was taught.
-        - **Keep your answers short and concise a student replying in a quiz.**
-        - Don’t pretend to know more than the lecture explained.
-        """
+async def stream_mimic_response(question: str, lecture_stats: dict):
+    """Server-sent events: `{"token": ...}` per chunk, then `{"done": true}`."""
+    started = time.perf_counter()
+    cached, cache_key = await response_cache.get(question, lecture_stats)
+    if cached is not None:
+        yield sse_event({"token": cached})
+        yield sse_event({"done": True, "cached": True})
+        return
 
-    # print(system_prompt)
+    parts = []
+    first_token = None
+    try:
+        async for token in get_llm_client().stream_chat(
+            build_messages(lecture_stats, question), **MODEL_PARAMS
+        ):
+            if first_token is None:
+                first_token = time.perf_counter()
+            parts.append(token)
+            yield sse_event({"token": token})
+    except Exception as e:
+        # Headers are already sent, so errors are reported in-band; anything
+        # escaping here would just cut the stream off without an error event
+        stream_metrics.record_error()
+        yield sse_event({"detail": f"LLM request failed: {e}"}, event="error")
+        return
 
-    chat_completion = client.chat.completions.create(
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": question},
-        ],
-        model="llama-3.3-70b-versatile",
-        temperature=0.7,
-        max_tokens=1024,
-        top_p=1,
-    )
+    finished = time.perf_counter()
+    if first_token is not None:
+        stream_metrics.record(
+            first_token - started, len(parts), finished - first_token
+        )
+    response = "".join(parts).strip()
+    await response_cache.put(cache_key, response, finished - started)
+    yield sse_event({"done": True})
+
+
+async def answer_quiz(questions, lecture_stats: dict, concurrency: int):
+    """NDJSON: one line per question as it finishes, then a summary line."""
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(concurrency)
+    # Compiled once here; every question reuses the cached prompt
+    compile_prompt(lecture_stats)
+
+    async def answer(index, question):
+        async with semaphore:
+            question_started = time.perf_counter()
+            try:
+                result = {
+                    "answer": await generate_mimic_response(question, lecture_stats)
+                }
+            except Exception as e:
+                # One failing question must not end the stream for the others
+                result = {"error": f"LLM request failed: {e}"}
+            result.update(
+                index=index,
+                question=question,
+                seconds=time.perf_counter() - question_started,
+            )
+            return result
 
-    return chat_completion.choices[0].message.content.strip()
+    tasks = [
+        asyncio.ensure_future(answer(index, question))
+        for index, question in enumerate(questions)
+    ]
+    failed = 0
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            failed += "error" in result
+            yield json.dumps(result) + "\n"
+    finally:
+        # Client went away: stop the questions that have not finished
+        for task in tasks:
+            task.cancel()
+    yield json.dumps(
+        {
+            "done": True,
+            "questions": len(questions),
+            "failed": failed,
+            "seconds": time.perf_counter() - started,
+        }
+    ) + "\n"
 
 
 @app.post("/ask")
-def ask_question(request: ChatRequest):
-    response = generate_mimic_response(request.question, request.analysis.dict())
+async def ask_question(request: ChatRequest):
+    analysis = resolve_analysis(request)
+    try:
+        response = await generate_mimic_response(request.question, analysis)
+    except APITimeoutError:
+        raise HTTPException(status_code=504, detail="LLM request timed out")
+    except APIError as e:
+        raise HTTPException(status_code=502, detail=f"LLM request failed: {e}")
     return {"response": response}
 
 
+@app.post("/ask/stream")
+async def ask_question_stream(request: ChatRequest):
+    analysis = resolve_analysis(request)
+    return StreamingResponse(
+        stream_mimic_response(request.question, analysis),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/quiz")
+async def take_quiz(request: QuizRequest):
+    if not 0 < len(request.questions) <= MAX_QUIZ_QUESTIONS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"A quiz needs between 1 and {MAX_QUIZ_QUESTIONS} questions",
+        )
+    analysis = resolve_analysis(request)
+    concurrency = min(request.concurrency or QUIZ_CONCURRENCY, QUIZ_CONCURRENCY)
+    return StreamingResponse(
+        answer_quiz(request.questions, analysis, max(concurrency, 1)),
+        media_type="application/x-ndjson",
+    )
+
+
+@app.post("/lectures")
+def register_lecture(registration: LectureRegistration):
+    lecture_id = lecture_store.add(
+        registration.analysis.dict(), title=registration.title
+    )
+    return {"lecture_id": lecture_id}
+
+
+@app.get("/lectures")
+def list_lectures():
+    return {"lectures": lecture_store.list()}
+
+
+@app.get("/lectures/{lecture_id}")
+def get_lecture(lecture_id: str):
+    analysis = lecture_store.get(lecture_id)
+    if analysis is None:
+        raise HTTPException(status_code=404, detail=f"Unknown lecture_id {lecture_id}")
+    return {"lecture_id": lecture_id, "analysis": analysis}
+
+
+@app.post("/uploads", status_code=201)
+def create_upload(creation: UploadCreation):
+    try:
+        return uploads.create(
+            creation.filename, creation.size, creation.title, creation.sha256
+        )
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@app.get("/uploads/{upload_id}")
+def get_upload(upload_id: str):
+    """Where to resume: send the next chunk at the returned offset."""
+    try:
+        return uploads.status(upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@app.put("/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, offset: int, request: Request):
+    try:
+        return await uploads.append(upload_id, offset, request.stream())
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@app.delete("/uploads/{upload_id}", status_code=204)
+def abort_upload(upload_id: str):
+    try:
+        uploads.abort(upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@app.get("/files/{sha256}")
+def get_uploaded_file(sha256: str):
+    record = uploads.get_file(sha256)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Unknown file {sha256}")
+    return record
+
+
+@app.get("/metrics")
+def get_metrics():
+    return {
+        "response_cache": response_cache.metrics(),
+        "streaming": stream_metrics.summary(),
+        "uploads": uploads.metrics(),
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,36 +1,169 @@
-import webvtt
-import json
-
+"""
+Caption reader for VTT and SRT files.
 
-def extract_sentences_from_vtt(vtt_file):
-    sentences = []
-    total_duration = 0.0
+iter_captions reads a file line by line and yields one record per caption
+({"sentence", "start", "end", "duration", "gap"}), so the analyzers (e.g.
+quality.pacing.analyze_timed_pacing) can consume captions straight from the
+file. Writing the records out is optional: JSON, JSON Lines, or a compact
+columnar .npz.
 
-    for caption in webvtt.read(vtt_file):
-        start_time = parse_time(caption.start)
-        end_time = parse_time(caption.end)
-        duration = end_time - start_time
+    python audio_files/vtt_convert.py sci_2.vtt -o output.json
 
-        sentences.append({"sentence": caption.text.strip(), "duration": duration})
-        total_duration += duration
+"""
 
-    result = {"sentences": sentences, "total_duration": total_duration}
+import json
+import os
+import re
+from array import array
 
-    # Save as JSON file
-    with open("output.json", "w", encoding="utf-8") as json_file:
-        json.dump(result, json_file, indent=4, ensure_ascii=False)
+import numpy as np
 
-    return result
+_TIMESTAMP = r"(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{3})"
+_CUE = re.compile(rf"^\s*{_TIMESTAMP}\s*-->\s*{_TIMESTAMP}")
+_CUE_TAGS = re.compile(r"<.*?>")
 
 
 def parse_time(time_str):
     """Converts VTT timestamp (hh:mm:ss.sss) to seconds."""
-    h, m, s = map(float, time_str.replace(",", ".").split(":"))
-    return h * 3600 + m * 60 + s
+    clock, _, fraction = time_str.replace(",", ".").partition(".")
+    seconds = 0
+    for part in clock.split(":"):
+        seconds = seconds * 60 + int(part)
+    return seconds + int(fraction.ljust(3, "0")[:3]) / 1000
+
+
+def iter_captions(source):
+    """Yields caption records from a VTT/SRT path or an iterable of lines.
+
+    `gap` is the silence between the previous caption's end and this one's
+    start (0 for the first caption and for overlapping captions).
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "r", encoding="utf-8-sig") as lines:
+            yield from iter_captions(lines)
+        return
+
+    previous_end = None
+    start = end = None
+    text_lines = []
+    for line in source:
+        line = line.rstrip("\r\n")
+        if start is None:
+            match = "-->" in line and _CUE.match(line)
+            if match:
+                h1, m1, s1, ms1, h2, m2, s2, ms2 = match.groups()
+                start = int(h1 or 0) * 3600 + int(m1) * 60 + int(s1) + int(ms1) / 1000
+                end = int(h2 or 0) * 3600 + int(m2) * 60 + int(s2) + int(ms2) / 1000
+            continue
+        if line.strip():
+            text_lines.append(line)
+            continue
+
+        yield _caption(start, end, text_lines, previous_end)
+        previous_end = end
+        start = None
+        text_lines = []
+    if start is not None:
+        yield _caption(start, end, text_lines, previous_end)
+
+
+def _caption(start, end, text_lines, previous_end):
+    text = "\n".join(text_lines)
+    if "<" in text:
+        text = _CUE_TAGS.sub("", text)
+    return {
+        "sentence": text.strip(),
+        "start": start,
+        "end": end,
+        "duration": end - start,
+        "gap": 0.0 if previous_end is None else max(start - previous_end, 0.0),
+    }
+
+
+def write_jsonl(captions, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for caption in captions:
+            f.write(json.dumps(caption, ensure_ascii=False))
+            f.write("\n")
+
+
+def read_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_npz(captions, path):
+    """Columnar form: start/end arrays plus all text as one UTF-8 buffer."""
+    starts, ends, offsets = array("d"), array("d"), array("q", [0])
+    text = bytearray()
+    for caption in captions:
+        starts.append(caption["start"])
+        ends.append(caption["end"])
+        text += caption["sentence"].encode("utf-8")
+        offsets.append(len(text))
+    np.savez_compressed(
+        path,
+        start=np.frombuffer(starts, dtype=np.float64),
+        end=np.frombuffer(ends, dtype=np.float64),
+        text_offsets=np.frombuffer(offsets, dtype=np.int64),
+        text=np.frombuffer(bytes(text), dtype=np.uint8),
+    )
+
+
+def read_npz(path):
+    with np.load(path) as data:
+        starts, ends = data["start"], data["end"]
+        offsets, text = data["text_offsets"], data["text"].tobytes()
+    gaps = np.maximum(starts[1:] - ends[:-1], 0.0)
+    for i in range(len(starts)):
+        yield {
+            "sentence": text[offsets[i] : offsets[i + 1]].decode("utf-8"),
+            "start": float(starts[i]),
+            "end": float(ends[i]),
+            "duration": float(ends[i] - starts[i]),
+            "gap": float(gaps[i - 1]) if i else 0.0,
+        }
+
+
+SERIALIZERS = {
+    ".jsonl": write_jsonl,
+    ".npz": write_npz,
+}
+
+
+def extract_sentences_from_vtt(vtt_file, output_path=None):
+    sentences = list(iter_captions(vtt_file))
+    result = {
+        "sentences": sentences,
+        "total_duration": sum(sentence["duration"] for sentence in sentences),
+    }
+
+    # Only written when asked for
+    if output_path is not None:
+        writer = SERIALIZERS.get(os.path.splitext(output_path)[1])
+        if writer is not None:
+            writer(sentences, output_path)
+        else:
+            with open(output_path, "w", encoding="utf-8") as json_file:
+                json.dump(result, json_file, indent=4, ensure_ascii=False)
+
+    return result
+
 
+if __name__ == "__main__":
+    import argparse
 
-# Example usage
-vtt_file_path = "sci_2.vtt"  # Replace with your VTT file path
-json_output = extract_sentences_from_vtt(vtt_file_path)
+    parser = argparse.ArgumentParser(description="Convert VTT/SRT captions.")
+    parser.add_argument("vtt_file", nargs="?", default="sci_2.vtt")
+    parser.add_argument(
+        "-o", "--output", default="output.json", help=".json, .jsonl or .npz"
+    )
+    args = parser.parse_args()
 
-# print(json.dumps(json_output, indent=4, ensure_ascii=False))
+    json_output = extract_sentences_from_vtt(args.vtt_file, args.output)
+    print(
+        f"{len(json_output['sentences'])} captions, "
+        f"{json_output['total_duration']:.1f}s of speech -> {args.output}"
+    )
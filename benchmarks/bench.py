@@ -0,0 +1,502 @@
+"""
+Benchmarks for the analysis, evaluation and API hot paths.
+
+Every (stage, size) pair runs in its own subprocess, so peak RSS is measured
+per stage and models or caches loaded by one stage do not flatter the next.
+Transcripts are synthetic and seeded, so runs are comparable across commits.
+
+Stages:
+- calculate_clarity, analyze_complexity, analyze_engagement, analyze_pacing:
+  one analyzer on a raw transcript (each parses it itself)
+- get_analysis: all analyzers on a shared document, uncached, with a
+  parse/per-analyzer breakdown and the warm-cache time
+- evaluate_batch: evaluate_batch throughput in pairs per second, plus the
+  per-call latency of evaluate_response
+- ask: /ask latency through the FastAPI app against llm_stub.py, first with
+  distinct questions, then repeated (response cache hits)
+
+    python -m benchmarks.bench
+    python -m benchmarks.bench --stages get_analysis --sizes 10000 --repeats 5
+    python -m benchmarks.bench --compare benchmarks/results/<older>.json
+
+Results are written to benchmarks/results/<time>-<commit>.json.
+
+"""
+
+import importlib
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+TRANSCRIPT_SIZES = (1_000, 10_000, 100_000)
+EVAL_PAIRS = (100, 1_000)
+ASK_REQUESTS = (200,)
+ASK_CONCURRENCY = 16
+WORDS_PER_MINUTE = 150  # sets the synthetic lecture's duration
+
+# Relative slowdown reported as a regression by --compare
+REGRESSION_THRESHOLD = 0.10
+
+_TOPIC_WORDS = (
+    "energy force motion gravity mass velocity acceleration friction cell "
+    "nutrient protein carbohydrate vitamin mineral digestion molecule atom "
+    "reaction equation fraction ratio triangle angle photosynthesis plant "
+    "water temperature pressure circuit current voltage magnet planet orbit"
+).split()
+_COMMON_WORDS = (
+    "the a an of to and in is that it this we for with as on are be can "
+    "so when which what how because very more most each other into some "
+    "look see think remember notice happens changes makes gives moves"
+).split()
+_NAMES = ["Newton", "Einstein", "India", "Delhi", "Curie", "NASA", "Europe"]
+_OPENERS = [
+    "For example,",
+    "Did you know",
+    "What if",
+    "Have you ever wondered why",
+    "I think",
+    "Remember that",
+    "Now,",
+    "In other words,",
+]
+
+
+def synthetic_transcript(words, seed=0):
+    """A lecture-like transcript of exactly `words` words."""
+    rng = np.random.default_rng(seed)
+    sentences = []
+    remaining = words
+    while remaining > 0:
+        length = min(int(rng.integers(5, 30)), remaining)
+        parts = list(rng.choice(_COMMON_WORDS, size=length))
+        topic = rng.random(length) < 0.35
+        parts = [
+            str(rng.choice(_TOPIC_WORDS)) if is_topic else str(word)
+            for word, is_topic in zip(parts, topic)
+        ]
+        if length > 6 and rng.random() < 0.3:
+            parts[int(rng.integers(1, length))] = str(rng.choice(_NAMES))
+        end = "."
+        if length > 4 and rng.random() < 0.4:
+            opener = str(rng.choice(_OPENERS)).split()
+            parts[: len(opener)] = opener
+            end = "?" if opener[0] in ("Did", "What", "Have") else "."
+        sentence = " ".join(parts)
+        sentences.append(sentence[0].upper() + sentence[1:] + end)
+        remaining -= length
+    return " ".join(sentences)
+
+
+def lecture_duration(words):
+    return words / WORDS_PER_MINUTE * 60
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _timed(fn, repeats):
+    seconds = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - started)
+    return seconds
+
+
+def _summary(seconds):
+    return {
+        "seconds": seconds,
+        "best_seconds": min(seconds),
+        "mean_seconds": sum(seconds) / len(seconds),
+    }
+
+
+def _analyzer_stage(name):
+    def stage(words, repeats):
+        module, analyzer = {
+            "calculate_clarity": ("clarity", "calculate_clarity"),
+            "analyze_complexity": ("complexity", "analyze_complexity"),
+            "analyze_engagement": ("engagement", "analyze_engagement"),
+            "analyze_pacing": ("pacing", "analyze_pacing"),
+        }[name]
+        fn = getattr(importlib.import_module(f"quality.{module}"), analyzer)
+        args = (lecture_duration(words),) if name == "analyze_pacing" else ()
+
+        started = time.perf_counter()
+        fn(synthetic_transcript(50, seed=1), *args)  # loads spaCy/NLTK
+        setup_seconds = time.perf_counter() - started
+        setup_rss = peak_rss_mb()
+
+        text = synthetic_transcript(words)
+        result = _summary(_timed(lambda: fn(text, *args), repeats))
+        result.update(
+            setup_seconds=setup_seconds,
+            setup_rss_mb=setup_rss,
+            words_per_second=words / result["best_seconds"],
+        )
+        return result
+
+    return stage
+
+
+def get_analysis_stage(words, repeats):
+    work_dir = tempfile.mkdtemp(prefix="bench-analysis-")
+    os.environ["ANALYSIS_CACHE_DIR"] = os.path.join(work_dir, "cache")
+    # get_analysis writes analysis_results.json to the working directory
+    os.chdir(work_dir)
+
+    from analysis.analysis import ANALYZER_NAMES, get_analysis, run_analyzer
+    from quality.document import LectureDocument
+
+    path = os.path.join(work_dir, "transcript.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(synthetic_transcript(words))
+    duration = lecture_duration(words)
+
+    started = time.perf_counter()
+    get_analysis(path, duration, use_cache=False)  # loads spaCy/NLTK
+    setup_seconds = time.perf_counter() - started
+    setup_rss = peak_rss_mb()
+
+    result = _summary(
+        _timed(lambda: get_analysis(path, duration, use_cache=False), repeats)
+    )
+
+    # Where the time goes: one shared parse, then each analyzer
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    breakdown = {}
+    started = time.perf_counter()
+    document = LectureDocument(text)
+    breakdown["tokenize"] = time.perf_counter() - started
+    started = time.perf_counter()
+    document.doc
+    document.sentence_stats
+    breakdown["parse"] = time.perf_counter() - started
+    for name in ANALYZER_NAMES:
+        started = time.perf_counter()
+        run_analyzer(name, document, duration)
+        breakdown[name] = time.perf_counter() - started
+
+    get_analysis(path, duration, use_cache=True)
+    cached = _timed(lambda: get_analysis(path, duration, use_cache=True), repeats)
+    result.update(
+        setup_seconds=setup_seconds,
+        setup_rss_mb=setup_rss,
+        words_per_second=words / result["best_seconds"],
+        breakdown_seconds=breakdown,
+        cached_best_seconds=min(cached),
+    )
+    return result
+
+
+def evaluate_batch_stage(pairs, repeats):
+    from evaluation.backends import sample_sentences
+    from evaluation.eval import evaluate_batch, evaluate_response
+
+    sentences = sample_sentences(pairs * 2)
+    answer_keys, responses = sentences[:pairs], sentences[pairs:]
+
+    started = time.perf_counter()
+    evaluate_batch(answer_keys[:8], responses[:8], use_cache=False)  # loads model
+    setup_seconds = time.perf_counter() - started
+    setup_rss = peak_rss_mb()
+
+    result = _summary(
+        _timed(lambda: evaluate_batch(answer_keys, responses, use_cache=False), repeats)
+    )
+    single = min(pairs, 20)
+    started = time.perf_counter()
+    for key, response in zip(answer_keys[:single], responses[:single]):
+        # Uncached like the batch runs: the persistent store would turn this
+        # into mmap lookups after the first run
+        evaluate_response(key, response, use_cache=False)
+    result.update(
+        setup_seconds=setup_seconds,
+        setup_rss_mb=setup_rss,
+        pairs_per_second=pairs / result["best_seconds"],
+        evaluate_response_seconds=(time.perf_counter() - started) / single,
+    )
+    return result
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_stub(port):
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_ROOT, "llm_stub.py")],
+        env={**os.environ, "LLM_STUB_PORT": str(port)},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return stub
+        except OSError:
+            time.sleep(0.1)
+    stub.kill()
+    raise RuntimeError("llm_stub.py did not start")
+
+
+def ask_stage(requests, repeats):
+    import asyncio
+
+    work_dir = tempfile.mkdtemp(prefix="bench-ask-")
+    port = _free_port()
+    stub = _start_stub(port)
+    os.environ.update(
+        GROQ_BASE_URL=f"http://127.0.0.1:{port}",
+        LECTURE_DB=os.path.join(work_dir, "lectures.db"),
+        UPLOAD_DIR=os.path.join(work_dir, "uploads"),
+        # Exact-match caching only, so no embedding model is loaded
+        RESPONSE_CACHE_SIMILARITY="0",
+    )
+    try:
+        import httpx
+
+        from app import app
+        from llm import close_clients
+
+        with open(
+            os.path.join(REPO_ROOT, "analysis", "analysis_results.json"), "r"
+        ) as f:
+            analysis = json.load(f)
+
+        async def run(questions):
+            semaphore = asyncio.Semaphore(ASK_CONCURRENCY)
+            latencies = []
+
+            async def ask(client, question):
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.post(
+                        "/ask",
+                        json={
+                            "user_id": "bench",
+                            "question": question,
+                            "analysis": analysis,
+                        },
+                    )
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - started)
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://bench"
+            ) as client:
+                started = time.perf_counter()
+                await asyncio.gather(*(ask(client, q) for q in questions))
+                wall = time.perf_counter() - started
+            latencies = np.array(latencies)
+            return {
+                "wall_seconds": wall,
+                "requests_per_second": len(questions) / wall,
+                "p50_seconds": float(np.percentile(latencies, 50)),
+                "p95_seconds": float(np.percentile(latencies, 95)),
+            }
+
+        async def phases():
+            # One event loop for every phase: the app's pooled LLM client and
+            # its semaphore belong to the loop they were first used on
+            try:
+                await run(["warm-up question?"])
+                setup_rss = peak_rss_mb()
+                runs = []
+                for repeat in range(repeats):
+                    questions = [
+                        f"Question {repeat}-{i}: what did the teacher say about energy?"
+                        for i in range(requests)
+                    ]
+                    runs.append(await run(questions))
+                # The same questions again are answered from the response cache
+                cached = await run(questions)
+                return setup_rss, runs, cached
+            finally:
+                await close_clients()
+
+        setup_rss, runs, cached = asyncio.run(phases())
+        walls = [run["wall_seconds"] for run in runs]
+        best = min(runs, key=lambda run: run["wall_seconds"])
+        result = _summary(walls)
+        result.update(
+            setup_rss_mb=setup_rss,
+            concurrency=ASK_CONCURRENCY,
+            requests_per_second=best["requests_per_second"],
+            p50_seconds=best["p50_seconds"],
+            p95_seconds=best["p95_seconds"],
+            cached_p50_seconds=cached["p50_seconds"],
+            stub_delay_seconds=float(os.environ.get("LLM_STUB_DELAY", "0.2")),
+        )
+        return result
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+STAGES = {
+    "calculate_clarity": (_analyzer_stage("calculate_clarity"), "words"),
+    "analyze_complexity": (_analyzer_stage("analyze_complexity"), "words"),
+    "analyze_engagement": (_analyzer_stage("analyze_engagement"), "words"),
+    "analyze_pacing": (_analyzer_stage("analyze_pacing"), "words"),
+    "get_analysis": (get_analysis_stage, "words"),
+    "evaluate_batch": (evaluate_batch_stage, "pairs"),
+    "ask": (ask_stage, "requests"),
+}
+
+
+def run_child(stage, size, repeats):
+    """Runs one stage in this process and prints its result as JSON."""
+    fn, _ = STAGES[stage]
+    result = fn(size, repeats)
+    result["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(result))
+
+
+def run_stage(stage, size, repeats, timeout=None):
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench", "--child", stage]
+        + ["--size", str(size), "--repeats", str(repeats)],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+    )
+    record = {"stage": stage, "unit": STAGES[stage][1], "size": size}
+    record["process_seconds"] = time.perf_counter() - started
+    if process.returncode != 0:
+        record["error"] = process.stderr.strip().splitlines()[-1:] or ["failed"]
+        record["error"] = record["error"][0]
+        return record
+    record.update(json.loads(process.stdout.strip().splitlines()[-1]))
+    return record
+
+
+def metadata():
+    def git(*args):
+        try:
+            return subprocess.run(
+                ["git", *args],
+                cwd=REPO_ROOT,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        "commit": git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(old, new, threshold=REGRESSION_THRESHOLD):
+    """Prints best-time changes per (stage, size); returns the regressions."""
+    previous = {
+        (record["stage"], record["size"]): record
+        for record in old["results"]
+        if "error" not in record
+    }
+    regressions = []
+    for record in new["results"]:
+        before = previous.get((record["stage"], record["size"]))
+        if before is None or "error" in record:
+            continue
+        change = record["best_seconds"] / before["best_seconds"] - 1
+        rss_change = record["peak_rss_mb"] - before["peak_rss_mb"]
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(record)
+        print(
+            f"{record['stage']:>20} {record['size']:>7}: "
+            f"{before['best_seconds']:9.4f}s -> {record['best_seconds']:9.4f}s "
+            f"({change:+.1%}), peak RSS {rss_change:+.1f} MB{flag}"
+        )
+    return regressions
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark EduIgnite hot paths.")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=None)
+    parser.add_argument("--sizes", nargs="+", type=int, default=TRANSCRIPT_SIZES)
+    parser.add_argument("--eval-pairs", nargs="+", type=int, default=EVAL_PAIRS)
+    parser.add_argument("--ask-requests", nargs="+", type=int, default=ASK_REQUESTS)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=1800)
+    parser.add_argument("-o", "--output", help="Default: benchmarks/results/")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.size, args.repeats)
+        return
+
+    sizes = {
+        "words": args.sizes,
+        "pairs": args.eval_pairs,
+        "requests": args.ask_requests,
+    }
+    report = {"meta": metadata(), "results": []}
+    report["meta"]["repeats"] = args.repeats
+    for stage in args.stages or STAGES:
+        for size in sizes[STAGES[stage][1]]:
+            record = run_stage(stage, size, args.repeats, args.timeout)
+            report["results"].append(record)
+            if "error" in record:
+                print(f"{stage:>20} {size:>7}: failed: {record['error']}")
+            else:
+                print(
+                    f"{stage:>20} {size:>7}: best {record['best_seconds']:9.4f}s, "
+                    f"mean {record['mean_seconds']:9.4f}s, "
+                    f"peak RSS {record['peak_rss_mb']:7.1f} MB"
+                )
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{report['meta']['commit'] or 'nogit'}"
+        output = os.path.join(RESULTS_DIR, f"{name}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        raise SystemExit(1 if regressions else 0)
+    raise SystemExit(1 if any("error" in r for r in report["results"]) else 0)
+
+
+if __name__ == "__main__":
+    main()
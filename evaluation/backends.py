@@ -0,0 +1,150 @@
+"""
+CPU inference backends for the evaluation embedding model.
+
+- torch:      float32 PyTorch (the reference)
+- torch-int8: PyTorch with Linear layers dynamically quantized to int8
+- onnx:       ONNX Runtime, using the export shipped with the model
+- onnx-int8:  ONNX Runtime, dynamically quantized export (ONNX_INT8_FILE)
+
+EVAL_BACKEND selects the backend used by eval.py and EVAL_THREADS the number
+of intra-op threads. Check a backend against the reference and measure it:
+
+    python -m evaluation.backends --backends torch torch-int8 onnx onnx-int8 --threads 4
+
+"""
+
+import os
+import time
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+REFERENCE_BACKEND = "torch"
+
+EVAL_BACKEND = os.environ.get("EVAL_BACKEND", REFERENCE_BACKEND)
+EVAL_THREADS = int(os.environ.get("EVAL_THREADS", "0")) or None
+ONNX_INT8_FILE = os.environ.get("ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+
+# Largest allowed difference in a pairwise cosine similarity against the
+# reference backend (eval.py reports similarity * 10 to two decimals)
+DEFAULT_TOLERANCE = 0.02
+
+
+def _onnx_kwargs(threads, file_name=None):
+    model_kwargs = {"provider": "CPUExecutionProvider"}
+    if file_name is not None:
+        model_kwargs["file_name"] = file_name
+    if threads:
+        import onnxruntime
+
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = threads
+        model_kwargs["session_options"] = session_options
+    return model_kwargs
+
+
+def load_model(backend=EVAL_BACKEND, threads=EVAL_THREADS, model_name=EMBEDDING_MODEL):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; expected one of {BACKENDS}")
+
+    if backend.startswith("onnx"):
+        file_name = ONNX_INT8_FILE if backend == "onnx-int8" else None
+        return SentenceTransformer(
+            model_name,
+            device="cpu",
+            backend="onnx",
+            model_kwargs=_onnx_kwargs(threads, file_name),
+        )
+
+    import torch
+
+    if threads:
+        torch.set_num_threads(threads)
+    model = SentenceTransformer(model_name, device="cpu")
+    if backend == "torch-int8":
+        torch.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+    return model
+
+
+def encode(model, texts, batch_size=64):
+    return model.encode(
+        texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True
+    )
+
+
+def validate(model, reference_model, texts, tolerance=DEFAULT_TOLERANCE):
+    """Compares a backend's similarity scores with the reference backend's."""
+    embeddings = encode(model, texts).astype(np.float64)
+    reference = encode(reference_model, texts).astype(np.float64)
+    similarity_error = np.abs(embeddings @ embeddings.T - reference @ reference.T)
+    embedding_cosine = np.einsum("ij,ij->i", embeddings, reference)
+    return {
+        "max_similarity_error": float(similarity_error.max()),
+        "mean_similarity_error": float(similarity_error.mean()),
+        "min_embedding_cosine": float(embedding_cosine.min()),
+        "within_tolerance": bool(similarity_error.max() <= tolerance),
+    }
+
+
+def benchmark(model, texts, batch_size=64, repeats=3):
+    """Best-of-`repeats` throughput in sentences per second."""
+    encode(model, texts[:batch_size], batch_size)  # warm-up
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        encode(model, texts, batch_size)
+        best = min(best, time.perf_counter() - started)
+    return len(texts) / best
+
+
+def sample_sentences(count, seed=0):
+    """Quiz-like sentences for validation and benchmarking."""
+    words = (
+        "food contains carbohydrates proteins fats vitamins minerals which help "
+        "growth energy a balanced diet has all essential nutrients in the right "
+        "proportions I think the teacher said maybe it is important for the body "
+        "and we should eat fruits vegetables grains every day"
+    ).split()
+    rng = np.random.default_rng(seed)
+    return [
+        " ".join(rng.choice(words, size=rng.integers(6, 30))).capitalize() + "."
+        for _ in range(count)
+    ]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Validate and benchmark embedding backends."
+    )
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS))
+    parser.add_argument("--threads", type=int, default=EVAL_THREADS)
+    parser.add_argument("--sentences", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    texts = sample_sentences(args.sentences)
+    reference = load_model(REFERENCE_BACKEND, args.threads)
+    for backend in args.backends:
+        model = (
+            reference
+            if backend == REFERENCE_BACKEND
+            else load_model(backend, args.threads)
+        )
+        result = validate(model, reference, texts[:200], args.tolerance)
+        result["sentences_per_second"] = benchmark(model, texts, args.batch_size)
+        print(
+            f"{backend:>10}: {result['sentences_per_second']:8.1f} sentences/s, "
+            f"max similarity error {result['max_similarity_error']:.4f}, "
+            f"{'ok' if result['within_tolerance'] else 'OUT OF TOLERANCE'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+On-disk store of sentence embeddings, so answer keys (and any response seen
+before) are encoded once across all evaluations.
+
+- Entries are keyed by the SHA-256 of the text, one directory per model name
+- Vectors are stored as float32 or float16 .npy segments and memory-mapped
+- Each write appends a new segment whose keys are sorted; lookups binary
+  search each segment, so opening the store never builds an index
+- Size-tiered compaction: once `tier_size` segments of about the same size
+  pile up at the new end, they are merged into one segment of the next tier.
+  Large old segments are only rewritten when as much new data has built up, so
+  each vector is rewritten O(log n) times rather than on every few writes
+
+"""
+
+import glob
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from analysis.cache import write_atomic
+
+DEFAULT_EMBEDDING_DIR = os.environ.get("EMBEDDING_CACHE_DIR", ".embedding_cache")
+DEFAULT_TIER_SIZE = 4
+KEY_DTYPE = "S32"
+
+
+def text_keys(texts):
+    return np.array(
+        [hashlib.sha256(text.encode("utf-8")).digest() for text in texts],
+        dtype=KEY_DTYPE,
+    )
+
+
+def _save_atomic(path, array):
+    write_atomic(path, lambda f: np.save(f, array), binary=True)
+
+
+class EmbeddingStore:
+    def __init__(
+        self,
+        model_name,
+        root=DEFAULT_EMBEDDING_DIR,
+        dtype=np.float32,
+        tier_size=DEFAULT_TIER_SIZE,
+    ):
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.tier_size = tier_size
+        self.path = os.path.join(root, re.sub(r"[^\w.-]", "_", model_name))
+        self._lock = threading.Lock()
+        self._segments = None  # [(name, keys, vectors)], oldest first
+
+    def _load_segments(self):
+        if self._segments is not None:
+            return
+        self._segments = []
+        # The keys file is written last, so it marks a complete segment
+        for keys_path in sorted(glob.glob(os.path.join(self.path, "*.keys.npy"))):
+            name = os.path.basename(keys_path)[: -len(".keys.npy")]
+            self._segments.append(self._open_segment(name))
+
+    def _open_segment(self, name):
+        base = os.path.join(self.path, name)
+        return (
+            name,
+            np.load(base + ".keys.npy", mmap_mode="r"),
+            np.load(base + ".vectors.npy", mmap_mode="r"),
+        )
+
+    def _write_segment(self, keys, vectors):
+        os.makedirs(self.path, exist_ok=True)
+        name = f"{time.time_ns():020d}-{os.getpid()}"
+        base = os.path.join(self.path, name)
+        _save_atomic(base + ".vectors.npy", vectors.astype(self.dtype, copy=False))
+        _save_atomic(base + ".keys.npy", keys)
+        return self._open_segment(name)
+
+    def __len__(self):
+        with self._lock:
+            self._load_segments()
+            return sum(len(keys) for _, keys, _ in self._segments)
+
+    def get_many(self, texts):
+        """Returns `(vectors, found)`; rows of `vectors` where `found` is False
+        are zero (`vectors` is None if the store is empty)."""
+        wanted = text_keys(texts)
+        with self._lock:
+            self._load_segments()
+            segments = list(self._segments)
+        found = np.zeros(len(wanted), dtype=bool)
+        vectors = None
+        # Newest first, so a re-written text resolves to its latest vector
+        for _, keys, segment_vectors in reversed(segments):
+            if found.all():
+                break
+            if vectors is None:
+                vectors = np.zeros(
+                    (len(wanted), segment_vectors.shape[1]), dtype=self.dtype
+                )
+            pending = np.flatnonzero(~found)
+            rows = np.searchsorted(keys, wanted[pending])
+            rows = np.minimum(rows, len(keys) - 1)
+            hit = keys[rows] == wanted[pending]
+            vectors[pending[hit]] = segment_vectors[rows[hit]]
+            found[pending[hit]] = True
+        return vectors, found
+
+    def put_many(self, texts, vectors):
+        if not len(texts):
+            return
+        keys, first = np.unique(text_keys(texts), return_index=True)
+        with self._lock:
+            # Before writing, or the new segment would be loaded from disk and
+            # then appended a second time
+            self._load_segments()
+        segment = self._write_segment(keys, np.asarray(vectors)[first])
+        with self._lock:
+            self._segments.append(segment)
+            replaced = []
+            while self._tier_run() >= self.tier_size:
+                replaced += self._merge_newest(self._tier_run())
+        self._remove_segments(replaced)
+
+    def encode(self, texts, encode_fn):
+        """Embeddings for `texts`, calling `encode_fn(list_of_texts)` only for
+        texts not already stored."""
+        vectors, found = self.get_many(texts)
+        missing = np.flatnonzero(~found)
+        if not len(missing):
+            return vectors
+        new_texts = [texts[i] for i in missing]
+        new_vectors = np.asarray(encode_fn(new_texts))
+        self.put_many(new_texts, new_vectors)
+        if vectors is None:
+            vectors = np.zeros((len(texts), new_vectors.shape[1]), dtype=self.dtype)
+        vectors[missing] = new_vectors
+        return vectors
+
+    def _tier(self, segment):
+        return int(math.log(max(len(segment[1]), 1), self.tier_size))
+
+    def _tier_run(self):
+        """How many of the newest segments are no larger than the newest one's tier."""
+        if not self._segments:
+            return 0
+        newest = self._tier(self._segments[-1])
+        run = 0
+        for segment in reversed(self._segments):
+            if self._tier(segment) > newest:
+                break
+            run += 1
+        return run
+
+    def _merge_newest(self, count):
+        """Merges the newest `count` segments into one, keeping the newest vector
+        per key, and returns the replaced segments. The caller holds the lock."""
+        old = self._segments[-count:]
+        keys = np.concatenate([segment_keys for _, segment_keys, _ in old])
+        vectors = np.concatenate([segment_vectors for _, _, segment_vectors in old])
+        # np.unique keeps the first occurrence, so search newest to oldest
+        order = np.arange(len(keys))[::-1]
+        keys, first = np.unique(keys[order], return_index=True)
+        self._segments[-count:] = [self._write_segment(keys, vectors[order][first])]
+        return old
+
+    def _remove_segments(self, segments):
+        for name, _, _ in segments:
+            base = os.path.join(self.path, name)
+            # Keys first, so a half-removed segment is never loaded
+            for suffix in (".keys.npy", ".vectors.npy"):
+                try:
+                    os.remove(base + suffix)
+                except FileNotFoundError:
+                    pass
+
+    def compact(self):
+        """Merges all segments into one, keeping the newest vector per key."""
+        with self._lock:
+            self._load_segments()
+            if len(self._segments) <= 1:
+                return
+            old = self._merge_newest(len(self._segments))
+        self._remove_segments(old)
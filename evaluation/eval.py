@@ -6,17 +6,41 @@ Confidence Level: How confidently AI answers.
 Concept Understanding: Depth of explanation.
 Misconceptions: Presence of incorrect reasoning.
 
+evaluate_batch scores many responses at once: every distinct answer key,
+response and truncated response is encoded in one batched call, and the
+similarities and rule-based scores are computed as array operations.
+Embeddings are kept in an on-disk EmbeddingStore, so only text that has not
+been seen before is encoded.
+
 """
 
+from functools import lru_cache
+
 import numpy as np
 import textstat
-import nltk
-from sentence_transformers import SentenceTransformer, util
-from sklearn.metrics.pairwise import cosine_similarity
-
-nltk.download("punkt")
-
-model = SentenceTransformer("all-MiniLM-L6-v2")
+from sentence_transformers import util
+
+from evaluation.backends import (
+    EMBEDDING_MODEL,
+    EVAL_BACKEND,
+    REFERENCE_BACKEND,
+    load_model,
+)
+from evaluation.embedding_store import EmbeddingStore
+
+ENCODE_BATCH_SIZE = 64
+
+UNCERTAINTY_PHRASES = ["i think", "i’m not sure", "i guess", "maybe", "probably"]
+EXAMPLE_KEYWORDS = ["for example", "such as", "like"]
+QUESTION_KEYWORDS = ["what if", "have you ever", "did you know"]
+
+WEIGHTS = {
+    "accuracy": 0.4,
+    "relevance": 0.2,
+    "clarity": 0.15,
+    "confidence": 0.15,
+    "engagement": 0.1,
+}
 
 quiz_data = [
     {
@@ -32,7 +56,21 @@ quiz_data = [
 ]
 
 
+@lru_cache(maxsize=None)
+def get_model():
+    return load_model()
+
+
+@lru_cache(maxsize=None)
+def get_embedding_store():
+    # Backends produce slightly different vectors, so each gets its own store
+    if EVAL_BACKEND == REFERENCE_BACKEND:
+        return EmbeddingStore(EMBEDDING_MODEL)
+    return EmbeddingStore(f"{EMBEDDING_MODEL}@{EVAL_BACKEND}")
+
+
 def semantic_similarity(ans1, ans2):
+    model = get_model()
     emb1 = model.encode(ans1, convert_to_tensor=True)
     emb2 = model.encode(ans2, convert_to_tensor=True)
     return float(util.pytorch_cos_sim(emb1, emb2)[0][0])
@@ -41,9 +79,6 @@ def semantic_similarity(ans1, ans2):
 def clarity_score(text):
     flesch_score = textstat.flesch_reading_ease(text)
     dale_chall_score = textstat.dale_chall_readability_score(text)
-    avg_sentence_length = sum(
-        len(nltk.word_tokenize(sent)) for sent in nltk.sent_tokenize(text)
-    ) / max(1, len(nltk.sent_tokenize(text)))
 
     if flesch_score < 50 or dale_chall_score > 9:
         return 1  # Too complex
@@ -54,65 +89,154 @@ def clarity_score(text):
 
 
 def confidence_level(response):
-    uncertainty_phrases = ["i think", "i’m not sure", "i guess", "maybe", "probably"]
-    for phrase in uncertainty_phrases:
+    for phrase in UNCERTAINTY_PHRASES:
         if phrase in response.lower():
             return 1
     return 3
 
 
 def engagement_score(response):
-    example_keywords = ["for example", "such as", "like"]
-    question_keywords = ["what if", "have you ever", "did you know"]
     score = 1
 
-    if any(word in response.lower() for word in example_keywords):
+    if any(word in response.lower() for word in EXAMPLE_KEYWORDS):
         score += 1
-    if any(word in response.lower() for word in question_keywords):
+    if any(word in response.lower() for word in QUESTION_KEYWORDS):
         score += 1
 
     return min(3, score)
 
 
-def evaluate_response(answer_key, ai_response):
-    scores = {}
+def _contains_any(lower_texts, phrases):
+    found = np.zeros(len(lower_texts), dtype=bool)
+    for phrase in phrases:
+        found |= np.char.find(lower_texts, phrase) >= 0
+    return found
 
-    scores["accuracy"] = round(semantic_similarity(answer_key, ai_response) * 10, 2)
 
-    scores["relevance"] = round(
-        semantic_similarity(answer_key, ai_response[: len(answer_key)]) * 10, 2
+def clarity_scores(texts):
+    """clarity_score for many texts; only the readability formulas run per text."""
+    flesch = np.fromiter(
+        (textstat.flesch_reading_ease(text) for text in texts),
+        dtype=np.float64,
+        count=len(texts),
+    )
+    dale = np.fromiter(
+        (textstat.dale_chall_readability_score(text) for text in texts),
+        dtype=np.float64,
+        count=len(texts),
     )
+    return np.select([(flesch < 50) | (dale > 9), flesch <= 70], [1, 2], default=3)
 
-    scores["clarity"] = clarity_score(ai_response) * 3.3
 
-    scores["confidence"] = confidence_level(ai_response) * 3.3
+def confidence_levels(responses):
+    lower = np.char.lower(np.asarray(responses, dtype=str))
+    return np.where(_contains_any(lower, UNCERTAINTY_PHRASES), 1, 3)
 
-    scores["engagement"] = engagement_score(ai_response) * 3.3
 
-    weights = {
-        "accuracy": 0.4,
-        "relevance": 0.2,
-        "clarity": 0.15,
-        "confidence": 0.15,
-        "engagement": 0.1,
-    }
-    final_score = sum(scores[factor] * weight for factor, weight in weights.items())
+def engagement_scores(responses):
+    lower = np.char.lower(np.asarray(responses, dtype=str))
+    return (
+        1
+        + _contains_any(lower, EXAMPLE_KEYWORDS)
+        + _contains_any(lower, QUESTION_KEYWORDS)
+    )
 
-    return scores, round(final_score, 2)
 
+def embed_unique(texts, batch_size=ENCODE_BATCH_SIZE, use_cache=True):
+    """Normalized embeddings for `texts`, encoding each distinct text once.
 
-results = []
-for data in quiz_data:
-    scores, final_score = evaluate_response(data["answer_key"], data["ai_response"])
-    results.append(
-        {"question": data["question"], "scores": scores, "final_score": final_score}
+    Returns `(embeddings, index)` where `embeddings[index[i]]` belongs to `texts[i]`.
+    """
+    positions = {}
+    index = np.fromiter(
+        (positions.setdefault(text, len(positions)) for text in texts),
+        dtype=np.intp,
+        count=len(texts),
     )
 
-for res in results:
-    print(f"\n Question: {res['question']}")
-    print(f"   Accuracy: {res['scores']['accuracy']}/10")
-    print(f"   Relevance: {res['scores']['relevance']}/10")
-    print(f"   Clarity: {res['scores']['clarity']}/10")
-    print(f"   Confidence: {res['scores']['confidence']}/10")
-    print(f"   Engagement: {res['scores']['engagement']}/10")
-    print(f"   Final Score: {res['final_score']}/10")
+    def encode(unique_texts):
+        return get_model().encode(
+            unique_texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+
+    if use_cache:
+        embeddings = get_embedding_store().encode(list(positions), encode)
+    else:
+        embeddings = encode(list(positions))
+    return embeddings.astype(np.float32, copy=False), index
+
+
+def evaluate_batch(
+    answer_keys, ai_responses, batch_size=ENCODE_BATCH_SIZE, use_cache=True
+):
+    """Scores many (answer key, response) pairs, e.g. every quiz of every student.
+
+    Returns `(scores, final_scores)`: a dict of per-factor arrays and an array
+    of final scores, in input order.
+    """
+    n = len(answer_keys)
+    if not n:
+        return {factor: np.zeros(0) for factor in WEIGHTS}, np.zeros(0)
+    truncated = [
+        response[: len(key)] for key, response in zip(answer_keys, ai_responses)
+    ]
+    embeddings, index = embed_unique(
+        [*answer_keys, *ai_responses, *truncated], batch_size, use_cache
+    )
+    keys = embeddings[index[:n]]
+    # Rows are unit length, so the row-wise dot product is the cosine similarity
+    accuracy = np.einsum("ij,ij->i", keys, embeddings[index[n : 2 * n]])
+    relevance = np.einsum("ij,ij->i", keys, embeddings[index[2 * n :]])
+    accuracy, relevance = accuracy.astype(np.float64), relevance.astype(np.float64)
+
+    scores = {
+        "accuracy": np.round(accuracy * 10, 2),
+        "relevance": np.round(relevance * 10, 2),
+        "clarity": clarity_scores(ai_responses) * 3.3,
+        "confidence": confidence_levels(ai_responses) * 3.3,
+        "engagement": engagement_scores(ai_responses) * 3.3,
+    }
+    final_scores = sum(scores[factor] * weight for factor, weight in WEIGHTS.items())
+    return scores, np.round(final_scores, 2)
+
+
+def evaluate_response(answer_key, ai_response, use_cache=True):
+    scores, final_scores = evaluate_batch(
+        [answer_key], [ai_response], use_cache=use_cache
+    )
+    return {factor: float(values[0]) for factor, values in scores.items()}, float(
+        final_scores[0]
+    )
+
+
+def evaluate_quiz(quiz_data, batch_size=ENCODE_BATCH_SIZE, use_cache=True):
+    scores, final_scores = evaluate_batch(
+        [data["answer_key"] for data in quiz_data],
+        [data["ai_response"] for data in quiz_data],
+        batch_size,
+        use_cache,
+    )
+    return [
+        {
+            "question": data["question"],
+            "scores": {factor: float(values[i]) for factor, values in scores.items()},
+            "final_score": float(final_scores[i]),
+        }
+        for i, data in enumerate(quiz_data)
+    ]
+
+
+if __name__ == "__main__":
+    results = evaluate_quiz(quiz_data)
+
+    for res in results:
+        print(f"\n Question: {res['question']}")
+        print(f"   Accuracy: {res['scores']['accuracy']}/10")
+        print(f"   Relevance: {res['scores']['relevance']}/10")
+        print(f"   Clarity: {res['scores']['clarity']}/10")
+        print(f"   Confidence: {res['scores']['confidence']}/10")
+        print(f"   Engagement: {res['scores']['engagement']}/10")
+        print(f"   Final Score: {res['final_score']}/10")
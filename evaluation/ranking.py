@@ -0,0 +1,292 @@
+"""
+Teacher ranking over AI-student evaluation results (readme Step 4).
+
+Results from evaluate_response / evaluate_batch are appended to columnar NumPy
+arrays (one row per evaluated answer). Per-teacher sums are updated on every
+insert, so rankings and top-k queries only touch one value per teacher. Rows
+are kept in timestamp order, so the improvement windows are slices found by
+binary search and only the rows inside them are aggregated.
+
+Teachers are ranked on:
+- performance: mean final score of their AI students
+- clarity_depth: mean clarity and accuracy of the answers
+- improvement: change in mean final score between the latest time window and
+  the one before it
+
+"""
+
+import time
+
+import numpy as np
+
+FACTORS = ("accuracy", "relevance", "clarity", "confidence", "engagement")
+
+RANKING_WEIGHTS = {
+    "performance": 0.6,
+    "clarity_depth": 0.3,
+    "improvement": 0.1,
+}
+
+INITIAL_CAPACITY = 1024
+
+
+class _Names:
+    """Interns names (teachers, students, ...) to dense integer ids."""
+
+    def __init__(self, names=()):
+        self.names = list(names)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def id(self, name):
+        i = self.ids.get(name)
+        if i is None:
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+    def ids_of(self, names):
+        return np.fromiter((self.id(name) for name in names), dtype=np.int32)
+
+
+class TeacherRanking:
+    def __init__(self):
+        self.teachers = _Names()
+        self.students = _Names()
+        self.tests = _Names()
+        self.topics = _Names()
+        self.size = 0
+        self._columns = {
+            "teacher": np.zeros(INITIAL_CAPACITY, dtype=np.int32),
+            "student": np.zeros(INITIAL_CAPACITY, dtype=np.int32),
+            "test": np.zeros(INITIAL_CAPACITY, dtype=np.int32),
+            "topic": np.zeros(INITIAL_CAPACITY, dtype=np.int32),
+            "timestamp": np.zeros(INITIAL_CAPACITY, dtype=np.float64),
+            "final_score": np.zeros(INITIAL_CAPACITY, dtype=np.float32),
+            **{
+                factor: np.zeros(INITIAL_CAPACITY, dtype=np.float32)
+                for factor in FACTORS
+            },
+        }
+        # Whether the rows are in timestamp order (results usually arrive in order)
+        self._time_sorted = True
+        # Incremental per-teacher aggregates
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._sums = {
+            name: np.zeros(0, dtype=np.float64) for name in ("final_score", *FACTORS)
+        }
+
+    def column(self, name):
+        return self._columns[name][: self.size]
+
+    def _reserve(self, extra):
+        needed = self.size + extra
+        capacity = len(self._columns["teacher"])
+        if needed > capacity:
+            capacity = max(needed, capacity * 2)
+            for name, values in self._columns.items():
+                grown = np.zeros(capacity, dtype=values.dtype)
+                grown[: self.size] = values[: self.size]
+                self._columns[name] = grown
+        teacher_count = len(self.teachers)
+        if teacher_count > len(self._counts):
+            pad = teacher_count - len(self._counts)
+            self._counts = np.pad(self._counts, (0, pad))
+            for name in self._sums:
+                self._sums[name] = np.pad(self._sums[name], (0, pad))
+
+    def add_batch(
+        self, teachers, students, tests, topics, scores, final_scores, timestamps=None
+    ):
+        """Appends evaluate_batch results; one entry per answer in each argument."""
+        n = len(final_scores)
+        rows = {
+            "teacher": self.teachers.ids_of(teachers),
+            "student": self.students.ids_of(students),
+            "test": self.tests.ids_of(tests),
+            "topic": self.topics.ids_of(topics),
+            "timestamp": (
+                np.full(n, time.time())
+                if timestamps is None
+                else np.asarray(timestamps, dtype=np.float64)
+            ),
+            "final_score": np.asarray(final_scores, dtype=np.float32),
+            **{
+                factor: np.asarray(scores[factor], dtype=np.float32)
+                for factor in FACTORS
+            },
+        }
+        timestamps = rows["timestamp"]
+        if n and (
+            (self.size and timestamps[0] < self._columns["timestamp"][self.size - 1])
+            or np.any(np.diff(timestamps) < 0)
+        ):
+            self._time_sorted = False
+        self._reserve(n)
+        end = self.size + n
+        for name, values in rows.items():
+            self._columns[name][self.size : end] = values
+        self.size = end
+
+        teacher_ids = rows["teacher"]
+        np.add.at(self._counts, teacher_ids, 1)
+        for name in self._sums:
+            np.add.at(self._sums[name], teacher_ids, rows[name])
+
+    def add(self, teacher, student, test, topic, scores, final_score, timestamp=None):
+        """Appends one evaluate_response result."""
+        self.add_batch(
+            [teacher],
+            [student],
+            [test],
+            [topic],
+            {factor: [scores[factor]] for factor in FACTORS},
+            [final_score],
+            None if timestamp is None else [timestamp],
+        )
+
+    def _means(self, name):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self._counts > 0, self._sums[name] / self._counts, 0.0)
+
+    def _sort_by_time(self):
+        """Reorders the rows by timestamp after out-of-order inserts."""
+        order = np.argsort(self.column("timestamp"), kind="stable")
+        for name, values in self._columns.items():
+            values[: self.size] = values[: self.size][order]
+        self._time_sorted = True
+
+    def improvement(self, window_seconds, now=None):
+        """Per teacher: mean final score in the last window minus the window before.
+
+        Teachers without results in both windows get 0.
+        """
+        now = time.time() if now is None else now
+        if not self._time_sorted:
+            self._sort_by_time()
+        timestamps = self.column("timestamp")
+        # Windows are (now - 2w, now - w] and (now - w, ...)
+        start, middle = np.searchsorted(
+            timestamps, [now - 2 * window_seconds, now - window_seconds], side="right"
+        )
+        teacher_ids = self.column("teacher")
+        scores = self.column("final_score")
+        means = []
+        for window in (slice(middle, self.size), slice(start, middle)):
+            counts = np.bincount(teacher_ids[window], minlength=len(self.teachers))
+            sums = np.bincount(
+                teacher_ids[window],
+                weights=scores[window],
+                minlength=len(self.teachers),
+            )
+            with np.errstate(divide="ignore", invalid="ignore"):
+                means.append(np.where(counts > 0, sums / counts, np.nan))
+        change = means[0] - means[1]
+        return np.nan_to_num(change, nan=0.0)
+
+    def ranking_scores(self, window_seconds=None, weights=RANKING_WEIGHTS, now=None):
+        """One combined score per teacher id (higher is better)."""
+        scores = weights["performance"] * self._means("final_score")
+        scores += (
+            weights["clarity_depth"]
+            * (self._means("clarity") + self._means("accuracy"))
+            / 2
+        )
+        if window_seconds is not None:
+            scores += weights["improvement"] * self.improvement(window_seconds, now)
+        return scores
+
+    def top_k(self, k=10, min_answers=1, window_seconds=None, now=None):
+        """The k best teachers as `(teacher, score)` pairs, best first."""
+        scores = self.ranking_scores(window_seconds, now=now)
+        eligible = np.flatnonzero(self._counts >= min_answers)
+        if not len(eligible):
+            return []
+        k = min(k, len(eligible))
+        eligible_scores = scores[eligible]
+        best = np.argpartition(-eligible_scores, k - 1)[:k]
+        best = best[np.argsort(-eligible_scores[best], kind="stable")]
+        return [
+            (self.teachers.names[eligible[i]], float(eligible_scores[i])) for i in best
+        ]
+
+    def rank_of(self, teacher, window_seconds=None, now=None):
+        """1-based rank of a teacher among all teachers with results.
+
+        None for a teacher without results.
+        """
+        teacher_id = self.teachers.ids.get(teacher)
+        if teacher_id is None or not self._counts[teacher_id]:
+            return None
+        scores = self.ranking_scores(window_seconds, now=now)
+        teacher_score = scores[teacher_id]
+        return int(np.count_nonzero(scores[self._counts > 0] > teacher_score)) + 1
+
+    def compare(self, student_a, student_b, topic=None):
+        """Head-to-head of two AI students on the tests both took.
+
+        Per test, the student with the higher mean final score wins it.
+        """
+        students = self.column("student")
+        tests = self.column("test")
+        scores = self.column("final_score")
+        in_topic = (
+            np.ones(self.size, dtype=bool)
+            if topic is None
+            else self.column("topic") == self.topics.ids.get(topic, -1)
+        )
+        per_test = []
+        for student in (student_a, student_b):
+            rows = in_topic & (students == self.students.ids.get(student, -1))
+            counts = np.bincount(tests[rows], minlength=len(self.tests))
+            sums = np.bincount(
+                tests[rows], weights=scores[rows], minlength=len(self.tests)
+            )
+            per_test.append((counts, sums))
+        common = (per_test[0][0] > 0) & (per_test[1][0] > 0)
+        mean_a = per_test[0][1][common] / per_test[0][0][common]
+        mean_b = per_test[1][1][common] / per_test[1][0][common]
+        return {
+            "tests": int(common.sum()),
+            "wins_a": int(np.count_nonzero(mean_a > mean_b)),
+            "wins_b": int(np.count_nonzero(mean_b > mean_a)),
+            "ties": int(np.count_nonzero(mean_a == mean_b)),
+            "mean_difference": float((mean_a - mean_b).mean()) if len(mean_a) else 0.0,
+        }
+
+    def save(self, path):
+        np.savez(
+            path,
+            **{name: self.column(name) for name in self._columns},
+            teacher_names=np.array(self.teachers.names, dtype=str),
+            student_names=np.array(self.students.names, dtype=str),
+            test_names=np.array(self.tests.names, dtype=str),
+            topic_names=np.array(self.topics.names, dtype=str),
+        )
+
+    @classmethod
+    def load(cls, path):
+        ranking = cls()
+        with np.load(path) as data:
+            ranking.teachers = _Names(data["teacher_names"].tolist())
+            ranking.students = _Names(data["student_names"].tolist())
+            ranking.tests = _Names(data["test_names"].tolist())
+            ranking.topics = _Names(data["topic_names"].tolist())
+            columns = {name: data[name] for name in ranking._columns}
+        n = len(columns["teacher"])
+        ranking._reserve(n)
+        for name, values in columns.items():
+            ranking._columns[name][:n] = values
+        ranking.size = n
+        ranking._time_sorted = not np.any(np.diff(columns["timestamp"]) < 0)
+        teacher_ids = columns["teacher"]
+        ranking._counts = np.bincount(teacher_ids, minlength=len(ranking.teachers))
+        ranking._sums = {
+            name: np.bincount(
+                teacher_ids, weights=columns[name], minlength=len(ranking.teachers)
+            )
+            for name in ranking._sums
+        }
+        return ranking
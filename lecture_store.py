@@ -0,0 +1,109 @@
+"""
+Server-side registry of analyzed lectures, so /ask can take a lecture_id
+instead of the full analysis on every question.
+
+- Analyses are stored in SQLite (LECTURE_DB, default lectures.db)
+- Recently used lectures are kept parsed in an in-memory LRU
+- Ids are derived from the analysis content, so registering the same
+  get_analysis() output twice returns the same id
+
+Register an analysis_results.json from the command line:
+
+    python lecture_store.py analysis_results.json --title "Intro to Physics"
+
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from response_cache import analysis_hash
+
+LECTURE_DB = os.environ.get("LECTURE_DB", "lectures.db")
+HOT_CACHE_SIZE = int(os.environ.get("LECTURE_HOT_CACHE_SIZE", "256"))
+LECTURE_ID_LENGTH = 16
+
+
+class LectureStore:
+    def __init__(self, path=LECTURE_DB, hot_size=HOT_CACHE_SIZE):
+        self.hot_size = hot_size
+        self._hot = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS lectures ("
+            "id TEXT PRIMARY KEY, title TEXT, analysis TEXT NOT NULL, created REAL)"
+        )
+        self._db.commit()
+
+    def _remember(self, lecture_id, analysis):
+        self._hot[lecture_id] = analysis
+        self._hot.move_to_end(lecture_id)
+        while len(self._hot) > self.hot_size:
+            self._hot.popitem(last=False)
+
+    def add(self, analysis, title=None):
+        """Registers an analysis and returns its lecture id."""
+        lecture_id = analysis_hash(analysis)[:LECTURE_ID_LENGTH]
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO lectures VALUES (?, ?, ?, ?)",
+                (lecture_id, title, json.dumps(analysis), time.time()),
+            )
+            if title is not None:
+                self._db.execute(
+                    "UPDATE lectures SET title = ? WHERE id = ?", (title, lecture_id)
+                )
+            self._db.commit()
+            self._remember(lecture_id, analysis)
+        return lecture_id
+
+    def get(self, lecture_id):
+        """The analysis dict for a lecture, or None if it is not registered."""
+        with self._lock:
+            analysis = self._hot.get(lecture_id)
+            if analysis is not None:
+                self._hot.move_to_end(lecture_id)
+                return analysis
+            row = self._db.execute(
+                "SELECT analysis FROM lectures WHERE id = ?", (lecture_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            analysis = json.loads(row[0])
+            self._remember(lecture_id, analysis)
+            return analysis
+
+    def list(self):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, title, created FROM lectures ORDER BY created DESC"
+            ).fetchall()
+        return [
+            {"lecture_id": lecture_id, "title": title, "created": created}
+            for lecture_id, title, created in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Register analyzed lectures.")
+    parser.add_argument("analysis_json", help="get_analysis() output file")
+    parser.add_argument("--title")
+    parser.add_argument("--db", default=LECTURE_DB)
+    args = parser.parse_args()
+
+    with open(args.analysis_json, "r", encoding="utf-8") as f:
+        analysis = json.load(f)
+    store = LectureStore(args.db)
+    print(store.add(analysis, title=args.title))
+    store.close()
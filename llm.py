@@ -0,0 +1,231 @@
+"""
+Async client for the Groq chat completions API used by the mimic bot.
+
+- One pooled httpx connection pool per upstream base URL, shared by all requests
+- Bounded concurrency towards the upstream (GROQ_MAX_CONCURRENCY)
+- Identical in-flight requests are coalesced into a single upstream call
+- Configurable timeout and retry with exponential backoff and jitter, waiting
+  as long as a rate-limited response's Retry-After asks instead
+- Token streaming (stream_chat), with time-to-first-token, chunks/s and error stats
+
+GROQ_API_KEY must be set in the environment. Set GROQ_BASE_URL to point the
+client at a local stub server instead (see llm_stub.py).
+
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import httpx
+import numpy as np
+from groq import (
+    AsyncGroq,
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+
+GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
+GROQ_BASE_URL = os.environ.get("GROQ_BASE_URL") or None
+GROQ_TIMEOUT = float(os.environ.get("GROQ_TIMEOUT", "60"))
+GROQ_MAX_RETRIES = int(os.environ.get("GROQ_MAX_RETRIES", "3"))
+GROQ_BACKOFF = float(os.environ.get("GROQ_BACKOFF", "0.5"))
+GROQ_MAX_CONCURRENCY = int(os.environ.get("GROQ_MAX_CONCURRENCY", "32"))
+# Upper bound on a server-requested Retry-After wait
+GROQ_MAX_RETRY_AFTER = float(os.environ.get("GROQ_MAX_RETRY_AFTER", "60"))
+
+RETRYABLE_ERRORS = (
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+
+
+def retry_after_seconds(error):
+    """The wait a 429/503 response asks for, or None if it does not say."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            value = headers["retry-after"]
+            try:
+                return float(value)
+            except ValueError:
+                retry_at = parsedate_to_datetime(value)
+                return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def request_key(messages, params):
+    payload = json.dumps([messages, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMClient:
+    def __init__(
+        self,
+        api_key=GROQ_API_KEY,
+        base_url=GROQ_BASE_URL,
+        timeout=GROQ_TIMEOUT,
+        max_retries=GROQ_MAX_RETRIES,
+        backoff=GROQ_BACKOFF,
+        max_concurrency=GROQ_MAX_CONCURRENCY,
+    ):
+        if api_key is None:
+            if base_url is None:
+                raise RuntimeError(
+                    "GROQ_API_KEY is not set; export it, or set GROQ_BASE_URL "
+                    "to a local stub (llm_stub.py)"
+                )
+            api_key = "unused"  # a local stub does not check the key
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._http = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+        )
+        # Retries are handled here so backoff and coalescing see every attempt
+        self._client = AsyncGroq(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=timeout,
+            max_retries=0,
+            http_client=self._http,
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight = {}
+
+    async def chat(self, messages, **params):
+        """Returns the completion text, sharing one upstream call between
+        identical concurrent requests."""
+        key = request_key(messages, params)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._chat_with_retry(messages, params))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shield so one caller disconnecting does not cancel the others
+        return await asyncio.shield(task)
+
+    async def _chat_with_retry(self, messages, params):
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    completion = await self._client.chat.completions.create(
+                        messages=messages, **params
+                    )
+                return completion.choices[0].message.content.strip()
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                await self._backoff(attempt, retry_after_seconds(e))
+
+    async def stream_chat(self, messages, **params):
+        """Yields completion text as the upstream produces it.
+
+        Failures are only retried before the first token has been sent.
+        """
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                async with self._semaphore:
+                    stream = await self._client.chat.completions.create(
+                        messages=messages, stream=True, **params
+                    )
+                    async with stream:
+                        async for chunk in stream:
+                            if not chunk.choices:
+                                continue
+                            delta = chunk.choices[0].delta.content
+                            if delta:
+                                started = True
+                                yield delta
+                return
+            except RETRYABLE_ERRORS as e:
+                if started or attempt == self.max_retries:
+                    raise
+                await self._backoff(attempt, retry_after_seconds(e))
+
+    async def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            # The server said when to come back; a little jitter spreads retries
+            delay = min(retry_after, GROQ_MAX_RETRY_AFTER)
+            await asyncio.sleep(delay + random.random() * self.backoff)
+            return
+        delay = self.backoff * (2**attempt)
+        await asyncio.sleep(delay * (0.5 + random.random()))
+
+    async def aclose(self):
+        await self._http.aclose()
+
+
+class StreamMetrics:
+    """Time-to-first-token, chunks/s and failures over the most recent streams.
+
+    Rates count streamed chunks (content deltas), which are not tokens: the
+    upstream may pack several tokens into one chunk.
+    """
+
+    def __init__(self, window=1000):
+        self.streams = 0
+        self.errors = 0
+        self.ttft = deque(maxlen=window)
+        self.chunks_per_second = deque(maxlen=window)
+
+    def record(self, ttft_seconds, chunks, generation_seconds):
+        self.streams += 1
+        self.ttft.append(ttft_seconds)
+        if generation_seconds > 0:
+            self.chunks_per_second.append(chunks / generation_seconds)
+
+    def record_error(self):
+        self.streams += 1
+        self.errors += 1
+
+    def summary(self):
+        summary = {"streams": self.streams, "errors": self.errors}
+        if self.ttft:
+            ttft = np.fromiter(self.ttft, dtype=np.float64)
+            summary["ttft_mean_seconds"] = float(ttft.mean())
+            summary["ttft_p50_seconds"], summary["ttft_p95_seconds"] = (
+                float(value) for value in np.percentile(ttft, [50, 95])
+            )
+        if self.chunks_per_second:
+            summary["chunks_per_second_mean"] = float(
+                np.mean(np.fromiter(self.chunks_per_second, dtype=np.float64))
+            )
+        return summary
+
+
+_clients = {}
+
+
+def get_llm_client(base_url=GROQ_BASE_URL):
+    """One client (and connection pool) per upstream base URL."""
+    client = _clients.get(base_url)
+    if client is None:
+        client = _clients[base_url] = LLMClient(base_url=base_url)
+    return client
+
+
+async def close_clients():
+    for client in list(_clients.values()):
+        await client.aclose()
+    _clients.clear()
@@ -0,0 +1,101 @@
+"""
+Local stand-in for the Groq chat completions API, for testing and benchmarks.
+
+Run it, then point the app at it:
+
+    python llm_stub.py                      # listens on :8001
+    GROQ_BASE_URL=http://localhost:8001 python app.py
+
+LLM_STUB_DELAY sets the simulated upstream latency in seconds. Streaming
+requests ("stream": true) send the first token after LLM_STUB_TTFT seconds and
+spread the rest of the delay over the remaining tokens.
+
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+STUB_DELAY = float(os.environ.get("LLM_STUB_DELAY", "0.2"))
+STUB_TTFT = float(os.environ.get("LLM_STUB_TTFT", "0.05"))
+
+app = FastAPI()
+stats = {"requests": 0}
+
+
+def _reply(messages):
+    question = messages[-1]["content"] if messages else ""
+    return f"I think the teacher said something about {question[:60]}"
+
+
+async def _stream(completion_id, model, content):
+    words = content.split(" ")
+    per_token = max(STUB_DELAY - STUB_TTFT, 0) / len(words)
+    await asyncio.sleep(STUB_TTFT)
+    for i, word in enumerate(words):
+        if i:
+            await asyncio.sleep(per_token)
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "delta": {"content": word if i == 0 else f" {word}"},
+                    "finish_reason": None,
+                }
+            ],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    content = _reply(body.get("messages", []))
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    if body.get("stream"):
+        return StreamingResponse(
+            _stream(completion_id, body.get("model", "stub"), content),
+            media_type="text/event-stream",
+        )
+
+    await asyncio.sleep(STUB_DELAY)
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": 0,
+            "completion_tokens": len(content.split()),
+            "total_tokens": len(content.split()),
+        },
+    }
+
+
+@app.get("/stats")
+def get_stats():
+    return stats
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("LLM_STUB_PORT", "8001")))
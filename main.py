@@ -1,8 +1,11 @@
+import json
 import streamlit as st
 import requests
 
-# FastAPI endpoint
-API_URL = "http://localhost:8000/ask"
+# FastAPI endpoints
+API_BASE = "http://localhost:8000"
+STREAM_URL = f"{API_BASE}/ask/stream"
+LECTURES_URL = f"{API_BASE}/lectures"
 
 st.set_page_config(page_title="Lecture Mimic Bot", layout="centered")
 
@@ -14,10 +17,9 @@ user_id = st.text_input("Your User ID", "user123")
 question = st.text_area("Enter your question here")
 
 st.markdown("### 📊 Loaded Lecture Analysis")
-st.info("Using detailed lecture analysis generated from uploaded content.")
 
-# Full Analysis - Replace with dynamic loading if needed
-analysis = {
+# Sample analysis, used when no lectures are registered with the API
+sample_analysis = {
     "clr": {
         "avg_sentence_length(Average words per sentence; shorter sentences improve clarity.)": 17.67,
         "flesch_score(Measures reading ease; higher scores indicate clearer speech.)": 72.46,
@@ -61,6 +63,39 @@ analysis = {
     },
 }
 
+
+@st.cache_data(ttl=30)
+def load_lectures():
+    try:
+        res = requests.get(LECTURES_URL, timeout=5)
+        res.raise_for_status()
+        return res.json()["lectures"]
+    except requests.exceptions.RequestException:
+        return []
+
+
+@st.cache_data
+def load_analysis(lecture_id):
+    res = requests.get(f"{LECTURES_URL}/{lecture_id}", timeout=5)
+    res.raise_for_status()
+    return res.json()["analysis"]
+
+
+lectures = load_lectures()
+lecture_id = None
+if lectures:
+    lecture = st.selectbox(
+        "Lecture",
+        lectures,
+        format_func=lambda lecture: lecture["title"] or lecture["lecture_id"],
+    )
+    lecture_id = lecture["lecture_id"]
+    analysis = load_analysis(lecture_id)
+    st.info("Using the lecture analysis registered with the API.")
+else:
+    analysis = sample_analysis
+    st.info("No registered lectures found; using the sample lecture analysis.")
+
 # Display summaries
 with st.expander("🔍 See Analysis Summary"):
     st.markdown(
@@ -76,18 +111,36 @@ with st.expander("🔍 See Analysis Summary"):
         f"- **Pacing**: {analysis['pac']['pacing_category(Classifies speech pacing as slow, moderate, or fast based on analysis.)']}"
     )
 
+
+def stream_tokens(res):
+    """Yields tokens from the /ask/stream server-sent events."""
+    event = None
+    for line in res.iter_lines(decode_unicode=True):
+        if line.startswith("event: "):
+            event = line[len("event: ") :]
+        elif line.startswith("data: "):
+            data = json.loads(line[len("data: ") :])
+            if event == "error":
+                raise requests.exceptions.RequestException(data["detail"])
+            if "token" in data:
+                yield data["token"]
+            event = None
+
+
 if st.button("Ask the Bot"):
     if not question.strip():
         st.error("Please enter a question.")
     else:
-        with st.spinner("Thinking like a student..."):
-            payload = {"user_id": user_id, "question": question, "analysis": analysis}
+        payload = {"user_id": user_id, "question": question}
+        if lecture_id is not None:
+            payload["lecture_id"] = lecture_id
+        else:
+            payload["analysis"] = analysis
 
-            try:
-                res = requests.post(API_URL, json=payload)
+        try:
+            with requests.post(STREAM_URL, json=payload, stream=True) as res:
                 res.raise_for_status()
-                response = res.json()["response"]
                 st.success("✅ Mimic Response:")
-                st.write(response)
-            except requests.exceptions.RequestException as e:
-                st.error(f"Error: {e}")
+                st.write_stream(stream_tokens(res))
+        except requests.exceptions.RequestException as e:
+            st.error(f"Error: {e}")
@@ -0,0 +1,110 @@
+"""
+Compiles a LectureAnalysis into the mimic bot's system prompt.
+
+- The fixed instruction block comes first and never changes, so the provider
+  can reuse its cached prefix across lectures
+- Metric keys drop their "(description)" suffix and values are rounded, which
+  removes most of the tokens the raw analysis dicts used to send
+- Compiled prompts are cached per analysis hash
+
+"""
+
+import threading
+from collections import OrderedDict
+
+from response_cache import analysis_hash
+
+PROMPT_CACHE_SIZE = 1024
+VALUE_PRECISION = 2
+MAX_LIST_ITEMS = 10
+
+SECTIONS = (
+    ("clr", "Clarity"),
+    ("com", "Complexity"),
+    ("eng", "Engagement"),
+    ("pac", "Pacing"),
+)
+
+INSTRUCTIONS = """You are an AI that mimics a student who has attended the given lecture. Your understanding is shaped entirely by how the teacher taught: their clarity, complexity, engagement, and pacing.
+You are answering test questions based on what you learned in that lecture. DO NOT use outside knowledge. Only respond based on how well the teacher explained it.
+
+How your answers should reflect the teaching:
+1. Realistic student understanding:
+- Complex words + clear examples -> you partially understand; refer to examples.
+- Complex words + no examples -> you struggle or misinterpret.
+- Low clarity + fast pacing -> your answer is rushed, vague, or confused.
+- Moderate clarity + high engagement -> you get some things, but miss others.
+2. Match the teacher's style:
+- If they repeated certain phrases -> you repeat them too.
+- If they used analogies -> you use the same ones. If not -> don't invent any.
+- If engagement was high -> sound excited, maybe ask rhetorical questions or mention jokes.
+- If engagement was low -> you sound bored, detached, or give minimal effort.
+3. Combine pacing + complexity:
+- Fast + complex -> you mix up or confuse ideas.
+- Slow + clear -> your answer is structured and clear.
+- Fast + clear -> you get the gist, but leave out details.
+4. Do not make up info:
+- If they skipped an explanation -> you admit you didn't get it.
+- If a term wasn't explained -> you stay confused or unsure.
+- If no examples were given -> don't invent one; say so.
+
+Final rules:
+- Answer each test question as a student would, based ONLY on how the topic was taught.
+- Keep your answers short and concise, like a student replying in a quiz.
+- Don't pretend to know more than the lecture explained."""
+
+_compiled = OrderedDict()
+_lock = threading.Lock()
+
+
+def short_key(key):
+    """`"flesch_score(Measures reading ease; ...)"` -> `"flesch_score"`."""
+    return key.split("(", 1)[0].strip()
+
+
+def compact_value(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, float):
+        return round(value, VALUE_PRECISION)
+    if isinstance(value, (list, tuple)):
+        items = [compact_value(item) for item in value[:MAX_LIST_ITEMS]]
+        if len(value) > MAX_LIST_ITEMS:
+            items.append(f"+{len(value) - MAX_LIST_ITEMS} more")
+        return items
+    return value
+
+
+def format_metrics(metrics):
+    return ", ".join(
+        f"{short_key(key)}={compact_value(value)}" for key, value in metrics.items()
+    )
+
+
+def compile_prompt(analysis):
+    """System prompt for an analysis dict (`{"clr": ..., "com": ..., ...}`)."""
+    key = analysis_hash(analysis)
+    with _lock:
+        prompt = _compiled.get(key)
+        if prompt is not None:
+            _compiled.move_to_end(key)
+            return prompt
+
+    style = "\n".join(
+        f"- {label}: {format_metrics(analysis.get(section, {}))}"
+        for section, label in SECTIONS
+    )
+    prompt = f"{INSTRUCTIONS}\n\nLecture teaching style:\n{style}"
+
+    with _lock:
+        _compiled[key] = prompt
+        while len(_compiled) > PROMPT_CACHE_SIZE:
+            _compiled.popitem(last=False)
+    return prompt
+
+
+def build_messages(analysis, question):
+    return [
+        {"role": "system", "content": compile_prompt(analysis)},
+        {"role": "user", "content": question},
+    ]
@@ -10,45 +10,30 @@ Can use textstat
 """
 
 import textstat
-import spacy
 from collections import Counter
 import nltk
-from nltk.tokenize import sent_tokenize, word_tokenize
-from nltk.corpus import stopwords
-from nltk.sentiment import SentimentIntensityAnalyzer
 import re
-
-nltk.download("punkt")
-nltk.download("stopwords")
-nltk.download("words")
-nltk.download("averaged_perceptron_tagger")
-nltk.download("maxent_ne_chunker")
-nltk.download("wordnet")
-nltk.download("omw-1.4")
-nltk.download("names")
-nltk.download("vader_lexicon")
-nlp = spacy.load("en_core_web_sm")
-sia = SentimentIntensityAnalyzer()
+from quality.document import as_document
+from quality.resources import get_sentiment_analyzer
 import warnings
 
 warnings.filterwarnings("ignore")
 
+ANALYZER_VERSION = 1
+
 
 def calculate_clarity(text):
-    sentences = sent_tokenize(text)
-    words = word_tokenize(text)
-    stop_words = set(stopwords.words("english"))
-    words_filtered = [w for w in words if w.isalnum() and w.lower() not in stop_words]
+    document = as_document(text)
+    text = document.text
+    words_filtered = document.filtered_words
 
-    avg_sentence_length = sum(len(word_tokenize(sent)) for sent in sentences) / len(
-        sentences
-    )
+    sentence_stats = document.sentence_stats
+    avg_sentence_length = sentence_stats.mean_length()
 
     flesch_score = textstat.flesch_reading_ease(text)
     dale_chall_score = textstat.dale_chall_readability_score(text)
 
-    doc = nlp(text)
-    named_entities = [ent.text for ent in doc.ents]
+    named_entities = document.named_entities
     jargon_score = len(named_entities) / max(len(words_filtered), 1)
 
     word_counts = Counter(words_filtered)
@@ -56,24 +41,44 @@ def calculate_clarity(text):
         len(words_filtered), 1
     )
 
-    filler_words = {"um", "uh", "like", "you know", "er", "hmm", "ah"}
-    filler_count = sum(1 for word in words if word.lower() in filler_words)
+    filler_count = sentence_stats.filler_count()
     filler_ratio = filler_count / max(len(words_filtered), 1)
 
-    sentiment_scores = sia.polarity_scores(text)
+    sentiment_scores = get_sentiment_analyzer().polarity_scores(text)
     sentiment = (
         "Positive"
         if sentiment_scores["compound"] > 0.3
         else "Negative" if sentiment_scores["compound"] < -0.3 else "Neutral"
     )
 
-    common_words = Counter(words_filtered).most_common(5)
+    common_words = word_counts.most_common(5)
 
     bigrams = list(nltk.bigrams(words_filtered))
     repeated_phrases = [
         " ".join(bigram) for bigram, count in Counter(bigrams).items() if count > 1
     ]
 
+    return clarity_from_metrics(
+        avg_sentence_length,
+        flesch_score,
+        dale_chall_score,
+        jargon_score,
+        redundancy_score,
+        filler_ratio,
+        common_words,
+    )
+
+
+def clarity_from_metrics(
+    avg_sentence_length,
+    flesch_score,
+    dale_chall_score,
+    jargon_score,
+    redundancy_score,
+    filler_ratio,
+    common_words,
+):
+    """Scores clarity from raw metrics so streaming analysis can reuse the formulas."""
     clarity_score = (
         (flesch_score / 100)
         - (dale_chall_score / 10)
@@ -7,19 +7,30 @@ spacy can be used
 
 """
 
-import spacy
 import textstat
-from nltk.tokenize import word_tokenize, sent_tokenize
 from collections import Counter
-import nltk
+from quality.document import as_document
 
-nltk.download("punkt")
-nlp = spacy.load("en_core_web_sm")
+ANALYZER_VERSION = 1
+
+# Domain-specific words counted towards technical term density
+TECHNICAL_TERMS = {
+    "algorithm",
+    "quantum",
+    "theorem",
+    "derivative",
+    "neural",
+    "molecular",
+    "syntactic",
+    "statistical",
+}
 
 
 def analyze_complexity(text):
-    sentences = sent_tokenize(text)
-    words = word_tokenize(text)
+    document = as_document(text)
+    text = document.text
+    sentences = document.sentences
+    words = document.words
     total_words = len(words)
     unique_words = len(set(words))
 
@@ -27,29 +38,25 @@ def analyze_complexity(text):
     lexical_diversity = unique_words / total_words if total_words else 0
 
     # Syntactic complexity (average dependency tree depth)
-    doc = nlp(text)
-    total_clauses = sum(
-        1 for token in doc if token.dep_ in {"ccomp", "xcomp", "advcl", "acl", "relcl"}
-    )
+    total_clauses = document.clause_count
     syntactic_complexity = total_clauses / len(sentences) if sentences else 0
 
     # Technical term density (count of domain-specific words)
-    technical_terms = {
-        "algorithm",
-        "quantum",
-        "theorem",
-        "derivative",
-        "neural",
-        "molecular",
-        "syntactic",
-        "statistical",
-    }
-    technical_term_count = sum(1 for word in words if word.lower() in technical_terms)
+    technical_term_count = sum(1 for word in words if word.lower() in TECHNICAL_TERMS)
     technical_term_density = technical_term_count / total_words if total_words else 0
 
     # Readability score (higher = easier to understand)
     readability = textstat.flesch_reading_ease(text)
 
+    return complexity_from_metrics(
+        lexical_diversity, syntactic_complexity, technical_term_density, readability
+    )
+
+
+def complexity_from_metrics(
+    lexical_diversity, syntactic_complexity, technical_term_density, readability
+):
+    """Builds the complexity result from raw metrics."""
     # Complexity score calculation (inverse of readability, weighted sum)
     complexity_score = (
         (1 - lexical_diversity) * 3
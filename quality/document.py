@@ -0,0 +1,70 @@
+"""
+Shared pre-processed lecture document.
+
+Tokenizing and parsing a transcript is the expensive part of every analyzer, so
+it is done once here and the result is handed to clarity, complexity,
+engagement and pacing.
+
+"""
+
+from functools import cached_property
+from quality.resources import sent_tokenize, word_tokenize, get_stopwords, get_nlp
+from quality.sentence_stats import SentenceStats
+
+# Dependency labels counted as clauses by the complexity and pacing analyzers
+CLAUSE_DEPS = {"ccomp", "xcomp", "advcl", "acl", "relcl"}
+
+
+def parse_summary(doc):
+    """The small, picklable part of a spaCy parse that the analyzers use."""
+    return {
+        "named_entities": [ent.text for ent in doc.ents],
+        "clause_count": sum(1 for token in doc if token.dep_ in CLAUSE_DEPS),
+    }
+
+
+class LectureDocument:
+    def __init__(self, text, doc=None, parse=None):
+        self.text = text
+        self.lower_text = text.lower()
+        self.sentences = sent_tokenize(text)
+        self.words = word_tokenize(text)
+        self.sentence_tokens = [word_tokenize(sent) for sent in self.sentences]
+        self.sentence_lengths = [len(tokens) for tokens in self.sentence_tokens]
+
+        stop_words = get_stopwords()
+        self.filtered_words = [
+            w for w in self.words if w.isalnum() and w.lower() not in stop_words
+        ]
+        self.filtered_words_lower = [w.lower() for w in self.filtered_words]
+
+        self._doc = doc
+        if parse is not None:
+            # Parse results computed elsewhere (e.g. by nlp.pipe in the batch runner)
+            self.__dict__.update(parse)
+
+    @property
+    def doc(self):
+        """spaCy parse of the full text, built on first access."""
+        if self._doc is None:
+            self._doc = get_nlp()(self.text)
+        return self._doc
+
+    @cached_property
+    def sentence_stats(self):
+        return SentenceStats.from_tokens(self.sentence_tokens, self.words)
+
+    @cached_property
+    def named_entities(self):
+        return [ent.text for ent in self.doc.ents]
+
+    @cached_property
+    def clause_count(self):
+        return sum(1 for token in self.doc if token.dep_ in CLAUSE_DEPS)
+
+
+def as_document(text):
+    """Accepts a raw transcript or an already built LectureDocument."""
+    if isinstance(text, LectureDocument):
+        return text
+    return LectureDocument(text)
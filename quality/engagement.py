@@ -6,91 +6,198 @@ nltk
 
 """
 
-import nltk
-import spacy
+import hashlib
+import json
+import os
 from collections import Counter
+from functools import lru_cache
 import textstat
-from nltk.tokenize import sent_tokenize, word_tokenize
-from nltk.corpus import stopwords
 import re
+from quality.document import as_document
+from quality.phrases import PhraseMatcher
 
-nltk.download("punkt")
-nltk.download("stopwords")
-nlp = spacy.load("en_core_web_sm")
+ANALYZER_VERSION = 2
 
+# Examples and analogies
+EXAMPLE_KEYWORDS = {
+    "for example",
+    "imagine",
+    "just like",
+    "consider",
+    "think about",
+}
 
-def analyze_engagement(text):
-    sentences = sent_tokenize(text)
-    words = word_tokenize(text)
-    stop_words = set(stopwords.words("english"))
-    words_filtered = [
-        w.lower() for w in words if w.isalnum() and w.lower() not in stop_words
-    ]
+# Direct audience engagement (use of 'you', 'we', 'let's')
+DIRECT_AUDIENCE_WORDS = {"you", "we", "let’s", "your", "us"}
 
-    # Detect examples and analogies
-    example_keywords = {
-        "for example",
-        "imagine",
-        "just like",
-        "consider",
-        "think about",
+EMOTIONAL_WORDS = {
+    "exciting",
+    "tragic",
+    "amazing",
+    "terrible",
+    "wonderful",
+    "shocking",
+}
+
+# Storytelling and anecdotes
+ANECDOTE_PHRASES = {
+    "i remember",
+    "back in my day",
+    "once upon a time",
+    "when i was",
+}
+
+CALL_TO_ACTION_PHRASES = {
+    "think about it",
+    "try this",
+    "you should",
+    "consider this",
+}
+
+HUMOR_WORDS = {"haha", "funny", "laugh", "hilarious", "joke"}
+
+DEFAULT_LEXICON = {
+    "example": EXAMPLE_KEYWORDS,
+    "anecdote": ANECDOTE_PHRASES,
+    "call_to_action": CALL_TO_ACTION_PHRASES,
+}
+
+# Extra phrases per subject, added on top of DEFAULT_LEXICON. They are read
+# from the JSON file named by SUBJECT_LEXICON_FILE, shaped like
+# {"science": {"example": ["such as"]}}; the environment reaches worker
+# processes too, so every process scores a subject with the same phrases.
+LEXICON_FILE_ENV = "SUBJECT_LEXICON_FILE"
+
+# Phrases added in this process only (register_lexicon)
+SUBJECT_LEXICONS = {}
+
+
+def register_lexicon(subject, **categories):
+    """Adds subject-specific phrases, e.g. register_lexicon("science", example={"such as"}).
+
+    Only this process sees them; use SUBJECT_LEXICON_FILE for worker pools.
+    """
+    lexicon = SUBJECT_LEXICONS.setdefault(subject, {})
+    for category, phrases in categories.items():
+        lexicon.setdefault(category, set()).update(phrases)
+    _phrase_matcher.cache_clear()
+    _lexicon_fingerprint.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def read_lexicon_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _lexicon_file():
+    return os.environ.get(LEXICON_FILE_ENV) or None
+
+
+def subject_lexicon(subject=None, lexicon_file=None):
+    lexicon = {category: set(phrases) for category, phrases in DEFAULT_LEXICON.items()}
+    sources = [SUBJECT_LEXICONS]
+    if lexicon_file:
+        sources.insert(0, read_lexicon_file(lexicon_file))
+    for source in sources:
+        for category, phrases in source.get(subject, {}).items():
+            lexicon.setdefault(category, set()).update(phrases)
+    return lexicon
+
+
+@lru_cache(maxsize=None)
+def _phrase_matcher(subject, lexicon_file):
+    return PhraseMatcher(subject_lexicon(subject, lexicon_file))
+
+
+def get_phrase_matcher(subject=None):
+    return _phrase_matcher(subject, _lexicon_file())
+
+
+@lru_cache(maxsize=None)
+def _lexicon_fingerprint(subject, lexicon_file):
+    lexicon = {
+        category: sorted(phrases)
+        for category, phrases in subject_lexicon(subject, lexicon_file).items()
+    }
+    return hashlib.sha256(json.dumps(lexicon, sort_keys=True).encode()).hexdigest()
+
+
+def lexicon_fingerprint(subject=None):
+    """Hash of the phrases used for `subject`, part of the engagement cache key."""
+    return _lexicon_fingerprint(subject, _lexicon_file())
+
+
+def count_phrases(lower_text, subject=None):
+    """Total occurrences per phrase category in one pass over the text."""
+    return {
+        category: sum(counts.values())
+        for category, counts in get_phrase_matcher(subject).count(lower_text).items()
     }
-    example_count = sum(1 for phrase in example_keywords if phrase in text.lower())
+
+
+def analyze_engagement(text, subject=None):
+    document = as_document(text)
+    text = document.text
+    lower_text = document.lower_text
+    words_filtered = document.filtered_words_lower
+    phrase_counts = count_phrases(lower_text, subject)
+
+    # Detect examples and analogies
+    example_count = phrase_counts["example"]
 
     # Detect questions
     question_count = text.count("?")
 
-    # Direct audience engagement (use of 'you', 'we', 'let's')
-    direct_audience_words = {"you", "we", "let’s", "your", "us"}
     direct_engagement_count = sum(
-        1 for word in words_filtered if word in direct_audience_words
+        1 for word in words_filtered if word in DIRECT_AUDIENCE_WORDS
     )
 
     # Detect emotional words
-    emotional_words = {
-        "exciting",
-        "tragic",
-        "amazing",
-        "terrible",
-        "wonderful",
-        "shocking",
-    }
-    emotional_word_count = sum(1 for word in words_filtered if word in emotional_words)
+    emotional_word_count = sum(1 for word in words_filtered if word in EMOTIONAL_WORDS)
 
     # Storytelling and anecdotes detection
-    anecdote_phrases = {
-        "i remember",
-        "back in my day",
-        "once upon a time",
-        "when i was",
-    }
-    anecdote_count = sum(1 for phrase in anecdote_phrases if phrase in text.lower())
+    anecdote_count = phrase_counts["anecdote"]
 
     # Sentence variation analysis
-    sentence_lengths = [len(word_tokenize(sentence)) for sentence in sentences]
-    avg_sentence_length = sum(sentence_lengths) / len(sentences) if sentences else 0
-    sentence_variation = (
-        max(sentence_lengths) - min(sentence_lengths) if sentences else 0
-    )
+    sentence_stats = document.sentence_stats
+    avg_sentence_length = sentence_stats.mean_length()
+    sentence_variation = sentence_stats.length_variation()
 
     # Call-to-action words
-    call_to_action_phrases = {
-        "think about it",
-        "try this",
-        "you should",
-        "consider this",
-    }
-    call_to_action_count = sum(
-        1 for phrase in call_to_action_phrases if phrase in text.lower()
-    )
+    call_to_action_count = phrase_counts["call_to_action"]
 
     # Humor detection
-    humor_words = {"haha", "funny", "laugh", "hilarious", "joke"}
-    humor_count = sum(1 for word in words_filtered if word in humor_words)
+    humor_count = sum(1 for word in words_filtered if word in HUMOR_WORDS)
 
     # Readability score
     readability = textstat.flesch_reading_ease(text)
 
+    return engagement_from_metrics(
+        example_count=example_count,
+        question_count=question_count,
+        direct_engagement_count=direct_engagement_count,
+        emotional_word_count=emotional_word_count,
+        anecdote_count=anecdote_count,
+        sentence_variation=sentence_variation,
+        call_to_action_count=call_to_action_count,
+        humor_count=humor_count,
+        readability=readability,
+    )
+
+
+def engagement_from_metrics(
+    example_count,
+    question_count,
+    direct_engagement_count,
+    emotional_word_count,
+    anecdote_count,
+    sentence_variation,
+    call_to_action_count,
+    humor_count,
+    readability,
+):
+    """Weighted engagement score and category from raw counts."""
     # Engagement Score Calculation (Weighted Sum)
     engagement_score = (
         (example_count * 2)
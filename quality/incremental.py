@@ -0,0 +1,119 @@
+"""
+Incremental (append-only) analysis for live transcription.
+
+Segments are appended as they arrive, e.g. the `{"sentence", "duration",
+"gap"}` records from audio_files/vtt_convert.iter_captions. Only the new
+text is tokenized and parsed; its statistics are merged into the running
+LectureStats, so each update costs O(new text). Captions often end mid
+sentence, so the unfinished tail is held back until its sentence completes
+and only counted provisionally when results are requested. The tail is also
+committed after a long pause between captions or once it passes
+MAX_TAIL_CHARS, so unpunctuated captions cannot make it grow without bound.
+
+"""
+
+import re
+
+from quality.document import LectureDocument
+from quality.resources import sent_tokenize
+from quality.streaming import LectureStats
+
+# Sentence-ending punctuation, optionally followed by closing quotes/brackets
+SENTENCE_END = re.compile(r"[.!?][\"'”’)\]]*$")
+SENTENCE_BREAK = re.compile(r"[.!?]")
+
+MAX_TAIL_CHARS = 2000
+TAIL_GAP_SECONDS = 2.0
+
+
+class IncrementalAnalyzer:
+    def __init__(self, subject=None):
+        self.subject = subject
+        self.stats = LectureStats()
+        self.duration_seconds = 0.0
+        self.segment_count = 0
+        self._tail = ""
+        self._tail_stats = None
+
+    def add_text(self, text, duration_seconds=0.0, gap_seconds=0.0):
+        self.duration_seconds += duration_seconds
+        self.segment_count += 1
+        if gap_seconds >= TAIL_GAP_SECONDS:
+            # A long pause ends whatever was being said
+            self.flush()
+
+        text = text.strip()
+        if not text:
+            return
+        self._tail_stats = None
+        if not SENTENCE_BREAK.search(text):
+            # Nothing in here can finish the tail's sentence
+            self._tail = f"{self._tail} {text}".strip()
+        else:
+            text = f"{self._tail} {text}".strip()
+            sentences = sent_tokenize(text)
+            if not SENTENCE_END.search(text):
+                # The last sentence is still being spoken
+                last = sentences.pop()
+                self._tail = text[text.rindex(last) :]
+                text = text[: len(text) - len(self._tail)]
+            else:
+                self._tail = ""
+            if sentences:
+                self.stats.add(LectureDocument(text), self.subject)
+        if len(self._tail) > MAX_TAIL_CHARS:
+            self.flush()
+
+    def add_segment(self, segment):
+        self.add_text(
+            segment["sentence"], segment.get("duration", 0.0), segment.get("gap", 0.0)
+        )
+
+    def extend(self, segments):
+        for segment in segments:
+            self.add_segment(segment)
+
+    def flush(self):
+        """Counts the held-back tail as a finished sentence (e.g. at end of stream)."""
+        if self._tail:
+            self.stats.add(LectureDocument(self._tail), self.subject)
+            self._tail = ""
+            self._tail_stats = None
+
+    def _with_tail(self, score):
+        """Applies `score` to the running statistics plus the unfinished tail.
+
+        The tail is merged in place and undone afterwards, so the cost stays
+        proportional to the tail rather than to the whole lecture.
+        """
+        if not self._tail:
+            return score(self.stats)
+        if self._tail_stats is None:
+            # Parsed once per change of the tail, not on every read
+            self._tail_stats = LectureStats.from_document(
+                LectureDocument(self._tail), self.subject
+            )
+        with self.stats.including(self._tail_stats) as stats:
+            return score(stats)
+
+    @property
+    def words_per_minute(self):
+        if self.duration_seconds <= 0:
+            return 0
+        word_count = self._with_tail(lambda stats: stats.word_count)
+        return word_count / self.duration_seconds * 60
+
+    def clarity(self):
+        return self._with_tail(LectureStats.clarity)
+
+    def complexity(self):
+        return self._with_tail(LectureStats.complexity)
+
+    def engagement(self):
+        return self._with_tail(LectureStats.engagement)
+
+    def pacing(self):
+        return self._with_tail(lambda stats: stats.pacing(self.duration_seconds))
+
+    def analysis(self):
+        return self._with_tail(lambda stats: stats.analysis(self.duration_seconds))
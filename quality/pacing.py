@@ -6,58 +6,46 @@ pyannote.audio
 
 """
 
-import spacy
-from nltk.tokenize import sent_tokenize, word_tokenize
-from collections import Counter
-import nltk
+import numpy as np
+from quality.document import as_document
+from quality.resources import word_tokenize
+from quality.sentence_stats import FILLER_WORDS, SentenceStats
 
-nltk.download("punkt")
-nlp = spacy.load("en_core_web_sm")
+ANALYZER_VERSION = 1
 
 
 def analyze_pacing(text, duration_seconds):
-    sentences = sent_tokenize(text)
-    words = word_tokenize(text)
+    document = as_document(text)
+    words = document.words
     total_words = len(words)
+    sentence_stats = document.sentence_stats
 
     # Words per minute calculation
     wpm = (total_words / duration_seconds) * 60 if duration_seconds > 0 else 0
 
     # Average sentence length
-    avg_sentence_length = sum(len(word_tokenize(sent)) for sent in sentences) / len(
-        sentences
-    )
+    avg_sentence_length = sentence_stats.mean_length()
 
     # Detect pauses (um, uh, etc.)
-    filler_words = {"um", "uh", "like", "you know", "er", "hmm", "ah"}
-    filler_count = sum(1 for word in words if word.lower() in filler_words)
+    filler_count = sentence_stats.filler_count()
     filler_ratio = filler_count / max(len(words), 1)
 
-    # Speech rate variability (standard deviation of sentence lengths)
-    sentence_lengths = [len(word_tokenize(sent)) for sent in sentences]
-    speech_rate_variability = sum(
-        abs(avg_sentence_length - length) for length in sentence_lengths
-    ) / len(sentences)
+    # Speech rate variability (mean absolute deviation of sentence lengths)
+    speech_rate_variability = sentence_stats.length_deviation()
 
     # Pause duration analysis (long pauses detected by multiple fillers in a row)
-    long_pause_count = sum(
-        1
-        for i in range(len(words) - 1)
-        if words[i].lower() in filler_words and words[i + 1].lower() in filler_words
-    )
+    long_pause_count = sentence_stats.consecutive_filler_count()
     long_pause_ratio = long_pause_count / max(len(words), 1)
 
-    # Complexity score based on sentence structure
-    doc = nlp(text)
-    syntactic_complexity = sum(
-        1 for token in doc if token.dep_ in {"ccomp", "xcomp", "advcl", "acl", "relcl"}
-    ) / len(sentences)
+    return pacing_from_metrics(
+        wpm, avg_sentence_length, speech_rate_variability, long_pause_ratio
+    )
 
-    # Emphasis detection (repeated words)
-    word_counts = Counter(words)
-    emphasized_words = [word for word, count in word_counts.items() if count > 2]
-    emphasis_ratio = len(emphasized_words) / max(len(words), 1)
 
+def pacing_from_metrics(
+    wpm, avg_sentence_length, speech_rate_variability, long_pause_ratio
+):
+    """Pacing result from raw metrics (also used by quality/streaming.py)."""
     # Pacing category based on empirical data
     if wpm > 150:
         pacing_category = "Too Fast"
@@ -78,6 +66,113 @@ def analyze_pacing(text, duration_seconds):
     }
 
 
+def _segment_arrays(segments):
+    """Word counts, filler flags, starts and ends from timed segments in one pass.
+
+    Segments without "start"/"end" (older vtt_convert output) are assumed to
+    follow each other with no gap.
+    """
+    lengths, filler_flags, starts, ends = [], [], [], []
+    clock = 0.0
+    for segment in segments:
+        tokens = word_tokenize(segment["sentence"])
+        start = segment.get("start", clock)
+        end = segment.get("end", start + segment.get("duration", 0.0))
+        clock = end
+        lengths.append(len(tokens))
+        filler_flags.extend(token.lower() in FILLER_WORDS for token in tokens)
+        starts.append(start)
+        ends.append(end)
+    return (
+        SentenceStats(lengths, filler_flags, np.subtract(ends, starts)),
+        np.asarray(starts, dtype=np.float64),
+        np.asarray(ends, dtype=np.float64),
+    )
+
+
+def _rate_profile(lengths, starts, ends, window_seconds, step_seconds):
+    """Words per minute in a sliding window, spreading each segment's words
+    evenly over its duration."""
+    if not len(lengths) or ends[-1] <= starts[0]:
+        return np.zeros(0)
+    # Words spoken by time t is piecewise linear: rising during captions, flat
+    # in the gaps between them
+    times = np.maximum.accumulate(np.column_stack([starts, ends]).ravel())
+    spoken_after = np.cumsum(lengths)
+    spoken = np.column_stack([spoken_after - lengths, spoken_after]).ravel()
+
+    bins = int(np.ceil((ends[-1] - starts[0]) / step_seconds))
+    edges = starts[0] + np.arange(bins + 1) * step_seconds
+    per_step = np.diff(np.interp(edges, times, spoken))
+
+    steps_per_window = max(1, int(round(window_seconds / step_seconds)))
+    if len(per_step) < steps_per_window:
+        return np.array([per_step.sum() / (len(per_step) * step_seconds) * 60])
+    window_words = np.convolve(per_step, np.ones(steps_per_window), mode="valid")
+    return window_words / (steps_per_window * step_seconds) * 60
+
+
+def analyze_timed_pacing(
+    segments, window_seconds=60, step_seconds=5, long_pause_seconds=1.0
+):
+    """Pacing from per-caption timings instead of a single total duration.
+
+    `segments` is an iterable of `{"sentence", "start", "end"}` records (or
+    `{"sentence", "duration"}`) as produced by vtt_convert. Silence between a
+    caption's end and the next caption's start is treated as a pause.
+    """
+    stats, starts, ends = _segment_arrays(segments)
+    lengths = stats.lengths
+    total_words = int(lengths.sum())
+    span = float(ends[-1] - starts[0]) if len(lengths) else 0.0
+
+    wpm = total_words / span * 60 if span > 0 else 0
+    segment_wpm = stats.words_per_minute()
+    speaking = stats.durations > 0
+    if speaking.any():
+        rates = segment_wpm[speaking]
+        speech_rate_variability = float(np.abs(rates - rates.mean()).mean())
+    else:
+        speech_rate_variability = 0
+
+    gaps = np.clip(starts[1:] - ends[:-1], 0, None)
+    long_pauses = gaps >= long_pause_seconds
+    long_pause_ratio = float(long_pauses.mean()) if len(gaps) else 0
+
+    profile = _rate_profile(lengths, starts, ends, window_seconds, step_seconds)
+
+    result = pacing_from_metrics(
+        wpm, stats.mean_length(), speech_rate_variability, long_pause_ratio
+    )
+    result.update(
+        {
+            "articulation_rate(Words per minute while actually speaking, excluding silences between captions.)": (
+                total_words / float(stats.durations.sum()) * 60
+                if stats.durations.sum() > 0
+                else 0
+            ),
+            "long_pause_count(Number of silences between captions longer than the long-pause threshold.)": int(
+                long_pauses.sum()
+            ),
+            "mean_pause_seconds(Average silence between captions.)": (
+                float(gaps.mean()) if len(gaps) else 0
+            ),
+            "max_pause_seconds(Longest silence between captions.)": (
+                float(gaps.max()) if len(gaps) else 0
+            ),
+            "rate_profile_range(Slowest and fastest WPM over a sliding window; a wide range means uneven pacing.)": (
+                [float(profile.min()), float(profile.max())] if len(profile) else [0, 0]
+            ),
+            "rate_profile_percentiles(10th, 50th and 90th percentile of the sliding-window WPM.)": (
+                [round(float(rate), 1) for rate in np.percentile(profile, [10, 50, 90])]
+                if len(profile)
+                else [0, 0, 0]
+            ),
+        }
+    )
+    return result
+
+
 if __name__ == "__main__":
     sample_text = "Quantum mechanics is a fundamental theory in physics that describes nature at the smallest scales. The behavior of particles is often counterintuitive, defying classical physics."
     duration = 10  # Assume the text was spoken in 10 seconds
@@ -0,0 +1,55 @@
+"""
+Multi-pattern phrase matcher.
+
+Phrases are compiled once into a token trie (the same idea as spaCy's
+PhraseMatcher), and the text is scanned in a single pass, reporting every
+occurrence of every phrase with its category and character offsets. Matching
+is on whole lowercase words, so "imagine" does not match inside "imagined",
+and overlapping phrases ("think about" / "think about it") are all reported.
+
+"""
+
+import re
+from collections import Counter
+
+_TOKEN = re.compile(r"[\w’']+")
+_END = object()  # trie key marking the end of a phrase
+
+
+class PhraseMatcher:
+    def __init__(self, lexicon):
+        """`lexicon` maps a category name to an iterable of phrases."""
+        self.categories = tuple(lexicon)
+        self._trie = {}
+        for category, phrases in lexicon.items():
+            for phrase in phrases:
+                node = self._trie
+                for token in _TOKEN.findall(phrase.lower()):
+                    node = node.setdefault(token, {})
+                node.setdefault(_END, []).append((category, phrase))
+
+    def finditer(self, text):
+        """Yields `(category, phrase, start, end)` for every match in `text`.
+
+        Offsets index into `text`; pass already lowercased text to skip a copy.
+        """
+        lowered = text if text.islower() else text.lower()
+        tokens = [(m.group(), m.start(), m.end()) for m in _TOKEN.finditer(lowered)]
+        trie = self._trie
+        for i, (token, start, _) in enumerate(tokens):
+            node = trie.get(token)
+            j = i
+            while node is not None:
+                for category, phrase in node.get(_END, ()):
+                    yield category, phrase, start, tokens[j][2]
+                j += 1
+                if j == len(tokens):
+                    break
+                node = node.get(tokens[j][0])
+
+    def count(self, text):
+        """Returns `{category: Counter(phrase -> occurrences)}`."""
+        counts = {category: Counter() for category in self.categories}
+        for category, phrase, _, _ in self.finditer(text):
+            counts[category][phrase] += 1
+        return counts
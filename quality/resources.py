@@ -0,0 +1,80 @@
+"""
+Shared, lazily loaded NLP resources.
+
+Every model and corpus is loaded once per process, on first use, and shared by
+all the quality analyzers. Nothing here touches the disk or network at import
+time. Missing NLTK corpora are downloaded on first use unless
+EDUIGNITE_OFFLINE=1 is set, in which case only installed resources are used.
+
+"""
+
+import os
+from functools import lru_cache
+
+import nltk
+
+SPACY_MODEL = "en_core_web_sm"
+OFFLINE = os.environ.get("EDUIGNITE_OFFLINE", "") == "1"
+
+# NLTK package name -> path checked with nltk.data.find
+NLTK_RESOURCES = {
+    "punkt_tab": "tokenizers/punkt_tab/english/",
+    "punkt": "tokenizers/punkt",
+    "stopwords": "corpora/stopwords",
+    "vader_lexicon": "sentiment/vader_lexicon.zip",
+}
+
+
+def _installed(package):
+    try:
+        nltk.data.find(NLTK_RESOURCES[package])
+        return True
+    except LookupError:
+        return False
+
+
+@lru_cache(maxsize=None)
+def ensure_nltk(*packages):
+    """Makes sure at least one of `packages` is installed, downloading if allowed."""
+    if any(_installed(package) for package in packages):
+        return
+    if OFFLINE:
+        raise LookupError(
+            f"NLTK resource {packages[0]!r} is not installed and EDUIGNITE_OFFLINE is set"
+        )
+    for package in packages:
+        nltk.download(package, quiet=True)
+
+
+def sent_tokenize(text):
+    # Newer NLTK releases ship the sentence tokenizer as punkt_tab
+    ensure_nltk("punkt_tab", "punkt")
+    return nltk.tokenize.sent_tokenize(text)
+
+
+def word_tokenize(text):
+    ensure_nltk("punkt_tab", "punkt")
+    return nltk.tokenize.word_tokenize(text)
+
+
+@lru_cache(maxsize=None)
+def get_nlp():
+    import spacy
+
+    return spacy.load(SPACY_MODEL)
+
+
+@lru_cache(maxsize=None)
+def get_stopwords():
+    ensure_nltk("stopwords")
+    from nltk.corpus import stopwords
+
+    return frozenset(stopwords.words("english"))
+
+
+@lru_cache(maxsize=None)
+def get_sentiment_analyzer():
+    ensure_nltk("vader_lexicon")
+    from nltk.sentiment import SentimentIntensityAnalyzer
+
+    return SentimentIntensityAnalyzer()
@@ -0,0 +1,80 @@
+"""
+Array-backed sentence statistics shared by pacing, clarity and engagement.
+
+Per-sentence token counts, per-token filler flags and (when known) per-sentence
+durations are stored as NumPy arrays, so averages, variability and filler runs
+are single vectorized operations instead of Python loops over token lists.
+
+"""
+
+import numpy as np
+
+FILLER_WORDS = {"um", "uh", "like", "you know", "er", "hmm", "ah"}
+
+
+class SentenceStats:
+    __slots__ = ("lengths", "filler_flags", "durations")
+
+    def __init__(self, lengths, filler_flags, durations=None):
+        self.lengths = np.asarray(lengths, dtype=np.int32)
+        self.filler_flags = np.asarray(filler_flags, dtype=bool)
+        self.durations = (
+            None if durations is None else np.asarray(durations, dtype=np.float64)
+        )
+
+    @classmethod
+    def from_tokens(cls, sentence_tokens, words, durations=None):
+        lengths = np.fromiter(
+            (len(tokens) for tokens in sentence_tokens),
+            dtype=np.int32,
+            count=len(sentence_tokens),
+        )
+        filler_flags = np.fromiter(
+            (word.lower() in FILLER_WORDS for word in words),
+            dtype=bool,
+            count=len(words),
+        )
+        return cls(lengths, filler_flags, durations)
+
+    @property
+    def sentence_count(self):
+        return len(self.lengths)
+
+    @property
+    def token_count(self):
+        return len(self.filler_flags)
+
+    def mean_length(self):
+        return float(self.lengths.mean()) if len(self.lengths) else 0
+
+    def length_deviation(self):
+        """Mean absolute deviation of sentence lengths."""
+        if not len(self.lengths):
+            return 0
+        return float(np.abs(self.lengths - self.lengths.mean()).mean())
+
+    def length_variation(self):
+        """Longest minus shortest sentence, in tokens."""
+        if not len(self.lengths):
+            return 0
+        return int(self.lengths.max() - self.lengths.min())
+
+    def length_histogram(self):
+        """`counts[n]` is the number of sentences with `n` tokens."""
+        return np.bincount(self.lengths)
+
+    def filler_count(self):
+        return int(np.count_nonzero(self.filler_flags))
+
+    def consecutive_filler_count(self):
+        """Number of adjacent filler-token pairs (runs of fillers read as long pauses)."""
+        flags = self.filler_flags
+        return int(np.count_nonzero(flags[:-1] & flags[1:]))
+
+    def words_per_minute(self):
+        """Per-sentence speaking rate, when durations are known."""
+        if self.durations is None:
+            return None
+        with np.errstate(divide="ignore", invalid="ignore"):
+            wpm = self.lengths / self.durations * 60
+        return np.where(self.durations > 0, wpm, 0.0)
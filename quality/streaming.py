@@ -0,0 +1,347 @@
+"""
+Streaming (chunked) analysis for very long transcripts.
+
+The transcript is split into sentence-aligned chunks that are tokenized and
+parsed one at a time. Each chunk only contributes mergeable statistics (counts,
+Counters, a sentence-length histogram, readability counts), so peak memory is
+bounded by the chunk size instead of the lecture length and spaCy's max_length
+is never hit. The merged statistics are scored with the same formulas as the
+whole-document analyzers.
+
+Readability mirrors textstat 0.7's Flesch reading ease and Dale-Chall formulas
+(including its intermediate rounding) on counts summed over chunks.
+
+"""
+
+import math
+import re
+from collections import Counter
+from contextlib import contextmanager
+
+import textstat
+
+from quality import clarity, complexity, engagement, pacing
+from quality.document import LectureDocument
+from quality.resources import sent_tokenize
+
+DEFAULT_CHUNK_CHARS = 100_000
+MAX_CHUNK_FACTOR = 4
+
+_TEXTSTAT_SENTENCE = re.compile(r"\b[^.!?]+[.!?]*", re.UNICODE)
+
+
+def iter_sentence_chunks(source, chunk_chars=DEFAULT_CHUNK_CHARS):
+    """Yields sentence-aligned chunks of roughly `chunk_chars` characters.
+
+    `source` is a string, an open file (read in `chunk_chars` blocks) or any
+    iterable of strings. Text without sentence breaks is split at whitespace
+    once it exceeds MAX_CHUNK_FACTOR chunks, so the buffer stays bounded.
+    """
+    if isinstance(source, str):
+        pieces = (
+            source[i : i + chunk_chars] for i in range(0, len(source), chunk_chars)
+        )
+    elif hasattr(source, "read"):
+        pieces = iter(lambda: source.read(chunk_chars), "")
+    else:
+        pieces = source
+
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        if len(buffer) < chunk_chars:
+            continue
+        sentences = sent_tokenize(buffer)
+        if len(sentences) > 1:
+            # The last sentence may continue in the next piece; carry it over
+            # along with any whitespace around it
+            split_at = buffer.rindex(sentences[-1])
+        elif len(buffer) > MAX_CHUNK_FACTOR * chunk_chars:
+            # No sentence break in sight (e.g. unpunctuated captions)
+            split_at = max(buffer.rfind(space) for space in " \n\t") + 1 or len(buffer)
+        else:
+            continue
+        chunk, buffer = buffer[:split_at], buffer[split_at:]
+        yield chunk
+    if buffer.strip():
+        yield buffer
+
+
+def _legacy_round(number, points):
+    p = 10**points
+    return float(math.floor((number * p) + math.copysign(0.5, number))) / p
+
+
+class LectureStats:
+    """Mergeable statistics for all four analyzers."""
+
+    def __init__(self):
+        self.sentence_count = 0
+        self.word_count = 0
+        self.sentence_length_counts = Counter()
+        self.unique_words = set()
+        self.filtered_word_count = 0
+        self.filtered_word_counts = Counter()
+        self.entity_count = 0
+        self.clause_count = 0
+        self.filler_count = 0
+        self.long_pause_count = 0
+        self.technical_term_count = 0
+        self.question_count = 0
+        self.direct_engagement_count = 0
+        self.emotional_word_count = 0
+        self.humor_count = 0
+        self.phrase_counts = Counter()
+
+        # textstat readability counts
+        self.lexicon_count = 0
+        self.syllable_count = 0
+        self.readability_sentences = 0
+        self.difficult_words = set()
+
+        # Whether the first/last token is a filler, to count runs across chunks
+        self.first_is_filler = False
+        self.last_is_filler = False
+
+    @classmethod
+    def from_document(cls, document, subject=None):
+        stats = cls()
+        words = document.words
+        lower_words = [word.lower() for word in words]
+        sentence_stats = document.sentence_stats
+        histogram = sentence_stats.length_histogram()
+        filler_flags = sentence_stats.filler_flags
+
+        stats.sentence_count = sentence_stats.sentence_count
+        stats.word_count = len(words)
+        stats.sentence_length_counts = Counter(
+            {int(length): int(histogram[length]) for length in histogram.nonzero()[0]}
+        )
+        stats.unique_words = set(words)
+        stats.filtered_word_count = len(document.filtered_words)
+        stats.filtered_word_counts = Counter(document.filtered_words)
+        stats.entity_count = len(document.named_entities)
+        stats.clause_count = document.clause_count
+        stats.filler_count = sentence_stats.filler_count()
+        stats.long_pause_count = sentence_stats.consecutive_filler_count()
+        stats.technical_term_count = sum(
+            1 for word in lower_words if word in complexity.TECHNICAL_TERMS
+        )
+        stats.question_count = document.text.count("?")
+
+        words_filtered = document.filtered_words_lower
+        stats.direct_engagement_count = sum(
+            1 for word in words_filtered if word in engagement.DIRECT_AUDIENCE_WORDS
+        )
+        stats.emotional_word_count = sum(
+            1 for word in words_filtered if word in engagement.EMOTIONAL_WORDS
+        )
+        stats.humor_count = sum(
+            1 for word in words_filtered if word in engagement.HUMOR_WORDS
+        )
+        stats.phrase_counts = Counter(
+            engagement.count_phrases(document.lower_text, subject)
+        )
+
+        text = document.text
+        stats.lexicon_count = textstat.lexicon_count(text)
+        stats.syllable_count = textstat.syllable_count(text)
+        stats.readability_sentences = sum(
+            1
+            for sentence in _TEXTSTAT_SENTENCE.findall(text)
+            if textstat.lexicon_count(sentence) > 2
+        )
+        stats.difficult_words = set(
+            textstat.difficult_words_list(text, syllable_threshold=0)
+        )
+
+        stats.first_is_filler = bool(len(filler_flags) and filler_flags[0])
+        stats.last_is_filler = bool(len(filler_flags) and filler_flags[-1])
+        return stats
+
+    def merge(self, other):
+        """Adds `other`, which covers the text right after this one."""
+        if self.last_is_filler and other.first_is_filler:
+            self.long_pause_count += 1
+        if self.word_count == 0:
+            self.first_is_filler = other.first_is_filler
+        if other.word_count:
+            self.last_is_filler = other.last_is_filler
+
+        self.sentence_count += other.sentence_count
+        self.word_count += other.word_count
+        self.sentence_length_counts.update(other.sentence_length_counts)
+        self.unique_words |= other.unique_words
+        self.filtered_word_count += other.filtered_word_count
+        self.filtered_word_counts.update(other.filtered_word_counts)
+        self.entity_count += other.entity_count
+        self.clause_count += other.clause_count
+        self.filler_count += other.filler_count
+        self.long_pause_count += other.long_pause_count
+        self.technical_term_count += other.technical_term_count
+        self.question_count += other.question_count
+        self.direct_engagement_count += other.direct_engagement_count
+        self.emotional_word_count += other.emotional_word_count
+        self.humor_count += other.humor_count
+        self.phrase_counts.update(other.phrase_counts)
+        self.lexicon_count += other.lexicon_count
+        self.syllable_count += other.syllable_count
+        self.readability_sentences += other.readability_sentences
+        self.difficult_words |= other.difficult_words
+        return self
+
+    def add(self, document, subject=None):
+        return self.merge(LectureStats.from_document(document, subject))
+
+    @contextmanager
+    def including(self, other):
+        """Temporarily merges `other`, undoing it on exit in O(size of `other`)."""
+        counters = ("sentence_length_counts", "filtered_word_counts", "phrase_counts")
+        sets = ("unique_words", "difficult_words")
+        scalars = {
+            name: value
+            for name, value in vars(self).items()
+            if name not in counters + sets
+        }
+        new_keys = {
+            name: [
+                key for key in getattr(other, name) if key not in getattr(self, name)
+            ]
+            for name in counters + sets
+        }
+        self.merge(other)
+        try:
+            yield self
+        finally:
+            vars(self).update(scalars)
+            for name in counters:
+                counter = getattr(self, name)
+                counter.subtract(getattr(other, name))
+                for key in new_keys[name]:
+                    del counter[key]
+            for name in sets:
+                getattr(self, name).difference_update(new_keys[name])
+
+    @property
+    def sentence_length_sum(self):
+        return sum(
+            length * count for length, count in self.sentence_length_counts.items()
+        )
+
+    @property
+    def avg_sentence_length(self):
+        return (
+            self.sentence_length_sum / self.sentence_count if self.sentence_count else 0
+        )
+
+    def sentence_length_deviation(self):
+        """Mean absolute deviation of sentence lengths, exact from the histogram."""
+        if not self.sentence_count:
+            return 0
+        mean = self.avg_sentence_length
+        return (
+            sum(
+                abs(mean - length) * count
+                for length, count in self.sentence_length_counts.items()
+            )
+            / self.sentence_count
+        )
+
+    def sentence_length_variance(self):
+        if not self.sentence_count:
+            return 0
+        mean = self.avg_sentence_length
+        return (
+            sum(
+                (length - mean) ** 2 * count
+                for length, count in self.sentence_length_counts.items()
+            )
+            / self.sentence_count
+        )
+
+    def flesch_reading_ease(self):
+        if not self.lexicon_count:
+            return _legacy_round(206.835, 2)
+        sentence_length = _legacy_round(
+            self.lexicon_count / max(1, self.readability_sentences), 1
+        )
+        syllables_per_word = _legacy_round(self.syllable_count / self.lexicon_count, 1)
+        return _legacy_round(
+            206.835 - 1.015 * sentence_length - 84.6 * syllables_per_word, 2
+        )
+
+    def dale_chall_score(self):
+        if not self.lexicon_count:
+            return 0.0
+        easy = self.lexicon_count - len(self.difficult_words)
+        per_difficult_words = 100 - easy / self.lexicon_count * 100
+        sentence_length = _legacy_round(
+            self.lexicon_count / max(1, self.readability_sentences), 1
+        )
+        score = 0.1579 * per_difficult_words + 0.0496 * sentence_length
+        if per_difficult_words > 5:
+            score += 3.6365
+        return _legacy_round(score, 2)
+
+    def clarity(self):
+        filtered = max(self.filtered_word_count, 1)
+        return clarity.clarity_from_metrics(
+            self.avg_sentence_length,
+            self.flesch_reading_ease(),
+            self.dale_chall_score(),
+            self.entity_count / filtered,
+            sum(1 for count in self.filtered_word_counts.values() if count > 2)
+            / filtered,
+            self.filler_count / filtered,
+            self.filtered_word_counts.most_common(5),
+        )
+
+    def complexity(self):
+        total_words = self.word_count
+        return complexity.complexity_from_metrics(
+            len(self.unique_words) / total_words if total_words else 0,
+            self.clause_count / self.sentence_count if self.sentence_count else 0,
+            self.technical_term_count / total_words if total_words else 0,
+            self.flesch_reading_ease(),
+        )
+
+    def engagement(self):
+        lengths = self.sentence_length_counts
+        return engagement.engagement_from_metrics(
+            example_count=self.phrase_counts["example"],
+            question_count=self.question_count,
+            direct_engagement_count=self.direct_engagement_count,
+            emotional_word_count=self.emotional_word_count,
+            anecdote_count=self.phrase_counts["anecdote"],
+            sentence_variation=max(lengths) - min(lengths) if lengths else 0,
+            call_to_action_count=self.phrase_counts["call_to_action"],
+            humor_count=self.humor_count,
+            readability=self.flesch_reading_ease(),
+        )
+
+    def pacing(self, duration_seconds):
+        wpm = (self.word_count / duration_seconds) * 60 if duration_seconds > 0 else 0
+        return pacing.pacing_from_metrics(
+            wpm,
+            self.avg_sentence_length,
+            self.sentence_length_deviation(),
+            self.long_pause_count / max(self.word_count, 1),
+        )
+
+    def analysis(self, duration_seconds):
+        return {
+            "clr": self.clarity(),
+            "com": self.complexity(),
+            "eng": self.engagement(),
+            "pac": self.pacing(duration_seconds),
+        }
+
+
+def analyze_stream(
+    source, duration_seconds, chunk_chars=DEFAULT_CHUNK_CHARS, subject=None
+):
+    """Runs all four analyzers over `source` (a string or an open file) chunk by chunk."""
+    stats = LectureStats()
+    for chunk in iter_sentence_chunks(source, chunk_chars):
+        stats.add(LectureDocument(chunk), subject)
+    return stats.analysis(duration_seconds)
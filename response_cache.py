@@ -0,0 +1,151 @@
+"""
+Response cache for generate_mimic_response.
+
+Exact tier: keyed by a canonical hash of the lecture analysis plus the
+normalized question, with TTL expiry and LRU eviction.
+
+Semantic tier (optional): when RESPONSE_CACHE_SIMILARITY is set, a question
+whose MiniLM embedding (the model used in evaluation/eval.py) is at least that
+cosine-similar to a cached question for the same analysis reuses its answer.
+
+Hit rates and the upstream latency saved are available from metrics().
+
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "4096"))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "86400"))
+RESPONSE_CACHE_SIMILARITY = float(os.environ.get("RESPONSE_CACHE_SIMILARITY", "0"))
+
+
+def analysis_hash(analysis):
+    canonical = json.dumps(analysis, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def normalize_question(question):
+    return re.sub(r"\s+", " ", question.strip().lower()).rstrip(" ?.!")
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries=RESPONSE_CACHE_SIZE,
+        ttl_seconds=RESPONSE_CACHE_TTL,
+        similarity_threshold=RESPONSE_CACHE_SIMILARITY,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()  # key -> (response, created, latency, vector)
+        self._by_analysis = {}  # analysis hash -> set of keys, for semantic lookup
+        self._lock = threading.Lock()
+        self._model = None
+        self._metrics = {
+            "hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "latency_saved_seconds": 0.0,
+        }
+
+    @property
+    def semantic(self):
+        return self.similarity_threshold > 0
+
+    def _embed(self, question):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+
+            self._model = SentenceTransformer(EMBEDDING_MODEL)
+        return self._model.encode(question, normalize_embeddings=True)
+
+    def _expired(self, entry, now):
+        return now - entry[1] > self.ttl_seconds
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        keys = self._by_analysis.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_analysis[key[0]]
+
+    def _hit(self, key, entry, semantic=False):
+        self._entries.move_to_end(key)
+        self._metrics["semantic_hits" if semantic else "hits"] += 1
+        self._metrics["latency_saved_seconds"] += entry[2]
+        return entry[0]
+
+    def _lookup(self, key, vector):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                return self._hit(key, entry)
+
+            if vector is not None:
+                candidates = [
+                    k
+                    for k in self._by_analysis.get(key[0], ())
+                    if not self._expired(self._entries[k], now)
+                ]
+                if candidates:
+                    vectors = np.stack([self._entries[k][3] for k in candidates])
+                    scores = vectors @ vector
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity_threshold:
+                        return self._hit(
+                            candidates[best], self._entries[candidates[best]], True
+                        )
+
+            self._metrics["misses"] += 1
+            return None
+
+    async def get(self, question, analysis):
+        """Returns `(response or None, key)`; pass the key back to put()."""
+        key = (analysis_hash(analysis), normalize_question(question))
+        vector = None
+        if self.semantic:
+            with self._lock:
+                exact = key in self._entries
+            if not exact:
+                vector = await asyncio.to_thread(self._embed, key[1])
+        return self._lookup(key, vector), (key, vector)
+
+    async def put(self, lookup_key, response, latency_seconds):
+        key, vector = lookup_key
+        if self.semantic and vector is None:
+            vector = await asyncio.to_thread(self._embed, key[1])
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (response, time.monotonic(), latency_seconds, vector)
+            if vector is not None:
+                self._by_analysis.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._metrics["evictions"] += 1
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["entries"] = len(self._entries)
+        lookups = metrics["hits"] + metrics["semantic_hits"] + metrics["misses"]
+        metrics["hit_rate"] = (
+            (metrics["hits"] + metrics["semantic_hits"]) / lookups if lookups else 0.0
+        )
+        return metrics
@@ -0,0 +1,349 @@
+"""
+Long-lived WhisperX transcription worker (the speech_to_text.ipynb flow as a
+service).
+
+- The Whisper and alignment models are loaded once and stay resident
+- On CPU the model runs with int8 compute
+- Long audio is split at silences into chunks that are transcribed in
+  parallel and stitched back together with their timestamps
+- Finished chunks are checkpointed, so a killed job resumes where it stopped
+- Output is a VTT file (readable by audio_files/vtt_convert.py) plus a JSON
+  file in the same shape as extract_sentences_from_vtt's result
+
+    python -m speech_to_text.transcribe audio/*.wav -o transcripts/ --workers 2
+
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from analysis.cache import write_json_atomic
+
+SAMPLE_RATE = 16000
+WHISPER_MODEL = os.environ.get("WHISPER_MODEL", "large-v2")
+BATCH_SIZE = int(os.environ.get("WHISPER_BATCH_SIZE", "16"))
+
+# Chunking: cut in the middle of silences at least MIN_SILENCE_SECONDS long,
+# keeping chunks under MAX_CHUNK_SECONDS where possible
+MAX_CHUNK_SECONDS = 300
+MIN_SILENCE_SECONDS = 0.5
+FRAME_SECONDS = 0.03
+SILENCE_DB = 35  # below the loudest frame
+
+
+def default_device():
+    import torch
+
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def split_on_silence(
+    audio,
+    sample_rate=SAMPLE_RATE,
+    max_chunk_seconds=MAX_CHUNK_SECONDS,
+    min_silence_seconds=MIN_SILENCE_SECONDS,
+):
+    """`(start, end)` sample ranges covering `audio`, cut at silent stretches."""
+    frame = int(FRAME_SECONDS * sample_rate)
+    n_frames = len(audio) // frame
+    if n_frames == 0 or len(audio) <= max_chunk_seconds * sample_rate:
+        return [(0, len(audio))]
+
+    # A float32 view of the audio; per-frame power without full-length temporaries
+    samples = np.asarray(audio, dtype=np.float32)[: n_frames * frame]
+    frames = samples.reshape(n_frames, frame)
+    power = np.einsum("ij,ij->i", frames, frames) / frame
+    level_db = 10 * np.log10(power.astype(np.float64) + 1e-12)
+    silent = level_db < level_db.max() - SILENCE_DB
+
+    # Silent runs as [start, end) frame indices
+    edges = np.diff(np.concatenate([[0], silent.astype(np.int8), [0]]))
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+    long_enough = run_ends - run_starts >= min_silence_seconds / FRAME_SECONDS
+    cut_points = (run_starts[long_enough] + run_ends[long_enough]) // 2 * frame
+
+    max_chunk = int(max_chunk_seconds * sample_rate)
+    chunks = []
+    start = 0
+    while len(audio) - start > max_chunk:
+        candidates = cut_points[
+            (cut_points > start) & (cut_points <= start + max_chunk)
+        ]
+        end = int(candidates[-1]) if len(candidates) else start + max_chunk
+        chunks.append((start, end))
+        start = end
+    chunks.append((start, len(audio)))
+    return chunks
+
+
+def format_timestamp(seconds):
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+
+
+def write_vtt(segments, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("WEBVTT\n\n")
+        for segment in segments:
+            f.write(
+                f"{format_timestamp(segment['start'])} --> "
+                f"{format_timestamp(segment['end'])}\n{segment['text'].strip()}\n\n"
+            )
+
+
+def sentences_result(segments):
+    """Segments in extract_sentences_from_vtt's output shape."""
+    sentences = [
+        {
+            "sentence": segment["text"].strip(),
+            "start": segment["start"],
+            "end": segment["end"],
+            "duration": segment["end"] - segment["start"],
+        }
+        for segment in segments
+    ]
+    return {
+        "sentences": sentences,
+        "total_duration": sum(sentence["duration"] for sentence in sentences),
+    }
+
+
+class TranscriptionWorker:
+    def __init__(
+        self,
+        model_name=WHISPER_MODEL,
+        device=None,
+        compute_type=None,
+        batch_size=BATCH_SIZE,
+        language=None,
+        workers=1,
+        cpu_threads=4,
+        align=True,
+    ):
+        self.model_name = model_name
+        self.device = device or default_device()
+        self.compute_type = compute_type or (
+            "float16" if self.device == "cuda" else "int8"
+        )
+        self.batch_size = batch_size
+        self.language = language
+        self.workers = workers
+        self.cpu_threads = cpu_threads
+        self.align = align
+        self._model = None
+        self._align_models = {}
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                import whisperx
+                from faster_whisper import WhisperModel
+
+                # num_workers lets several chunks run through one resident model
+                whisper = WhisperModel(
+                    self.model_name,
+                    device=self.device,
+                    compute_type=self.compute_type,
+                    cpu_threads=self.cpu_threads,
+                    num_workers=self.workers,
+                )
+                self._model = whisperx.load_model(
+                    self.model_name,
+                    self.device,
+                    compute_type=self.compute_type,
+                    language=self.language,
+                    model=whisper,
+                )
+            return self._model
+
+    def align_model(self, language):
+        with self._lock:
+            if language not in self._align_models:
+                import whisperx
+
+                self._align_models[language] = whisperx.load_align_model(
+                    language_code=language, device=self.device
+                )
+            return self._align_models[language]
+
+    def transcribe_chunk(self, audio, offset_seconds, language=None):
+        """Segments for one chunk, with timestamps relative to the whole file."""
+        result = self.model.transcribe(
+            audio, batch_size=self.batch_size, language=language
+        )
+        language = result["language"]
+        segments = result["segments"]
+        if self.align and segments:
+            import whisperx
+
+            align_model, metadata = self.align_model(language)
+            segments = whisperx.align(
+                segments,
+                align_model,
+                metadata,
+                audio,
+                self.device,
+                return_char_alignments=False,
+            )["segments"]
+        return language, [
+            {
+                "start": segment["start"] + offset_seconds,
+                "end": segment["end"] + offset_seconds,
+                "text": segment["text"],
+            }
+            for segment in segments
+            if "start" in segment and "end" in segment
+        ]
+
+    def transcribe_file(self, audio_path, output_dir):
+        """Transcribes one file, resuming from its checkpoint if there is one."""
+        import whisperx
+
+        started = time.perf_counter()
+        os.makedirs(output_dir, exist_ok=True)
+        name = os.path.splitext(os.path.basename(audio_path))[0]
+        vtt_path = os.path.join(output_dir, f"{name}.vtt")
+        json_path = os.path.join(output_dir, f"{name}.json")
+        checkpoint_path = os.path.join(output_dir, f"{name}.checkpoint.json")
+
+        audio = whisperx.load_audio(audio_path)
+        chunks = split_on_silence(audio)
+        checkpoint = {
+            "audio": os.path.abspath(audio_path),
+            "mtime": os.path.getmtime(audio_path),
+            "chunks": chunks,
+            "language": self.language,
+            "done": {},
+        }
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            # Only resume if the audio and its chunking are unchanged
+            if saved["mtime"] == checkpoint["mtime"] and saved["chunks"] == [
+                list(chunk) for chunk in chunks
+            ]:
+                checkpoint = saved
+        resumed = len(checkpoint["done"])
+        pending = [i for i in range(len(chunks)) if str(i) not in checkpoint["done"]]
+
+        # The first chunk fixes the language so the others skip detection
+        if pending and checkpoint["language"] is None:
+            first = pending.pop(0)
+            start, end = chunks[first]
+            language, segments = self.transcribe_chunk(
+                audio[start:end], start / SAMPLE_RATE
+            )
+            checkpoint["language"] = language
+            checkpoint["done"][str(first)] = segments
+            write_json_atomic(checkpoint, checkpoint_path)
+
+        checkpoint_lock = threading.Lock()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {
+                pool.submit(
+                    self.transcribe_chunk,
+                    audio[chunks[i][0] : chunks[i][1]],
+                    chunks[i][0] / SAMPLE_RATE,
+                    checkpoint["language"],
+                ): i
+                for i in pending
+            }
+            error = None
+            for future in as_completed(futures):
+                # Keep every chunk that did finish, then report the failure
+                try:
+                    _, segments = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                with checkpoint_lock:
+                    checkpoint["done"][str(futures[future])] = segments
+                    write_json_atomic(checkpoint, checkpoint_path)
+        if error is not None:
+            raise error
+
+        segments = [
+            segment
+            for i in range(len(chunks))
+            for segment in checkpoint["done"][str(i)]
+        ]
+        write_vtt(segments, vtt_path)
+        result = sentences_result(segments)
+        result["language"] = checkpoint["language"]
+        write_json_atomic(result, json_path)
+        os.remove(checkpoint_path)
+
+        seconds = time.perf_counter() - started
+        audio_seconds = len(audio) / SAMPLE_RATE
+        return {
+            "audio": audio_path,
+            "status": "transcribed",
+            "vtt": vtt_path,
+            "json": json_path,
+            "language": checkpoint["language"],
+            "chunks": len(chunks),
+            "resumed_chunks": resumed,
+            "seconds": seconds,
+            "realtime_factor": audio_seconds / seconds if seconds else 0.0,
+        }
+
+    def process(self, audio_paths, output_dir):
+        """Transcribes files one after another with the resident models,
+        yielding a result dict per file; failures do not stop the queue.
+
+        `audio_paths` is an iterable or a queue.Queue ended with None.
+        """
+        if isinstance(audio_paths, queue.Queue):
+            audio_paths = iter(audio_paths.get, None)
+        for audio_path in audio_paths:
+            try:
+                yield self.transcribe_file(audio_path, output_dir)
+            except Exception as e:
+                yield {"audio": audio_path, "status": "failed", "error": str(e)}
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Transcribe audio with WhisperX.")
+    parser.add_argument("audio", nargs="+")
+    parser.add_argument("-o", "--output-dir", default="audio_files")
+    parser.add_argument("--model", default=WHISPER_MODEL)
+    parser.add_argument("--device")
+    parser.add_argument("--compute-type")
+    parser.add_argument("--language")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--cpu-threads", type=int, default=4)
+    parser.add_argument("--no-align", action="store_true")
+    args = parser.parse_args()
+
+    worker = TranscriptionWorker(
+        args.model,
+        device=args.device,
+        compute_type=args.compute_type,
+        language=args.language,
+        workers=args.workers,
+        cpu_threads=args.cpu_threads,
+        align=not args.no_align,
+    )
+    failed = 0
+    for result in worker.process(args.audio, args.output_dir):
+        failed += result["status"] == "failed"
+        print(json.dumps(result))
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
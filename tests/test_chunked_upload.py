@@ -0,0 +1,103 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from upload.chunked import UploadError, UploadManager
+
+
+async def chunks_of(data, size=3):
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+async def dropped_after(data, size=3):
+    """A request stream whose connection drops after `data`."""
+    async for chunk in chunks_of(data, size):
+        yield chunk
+    raise ConnectionResetError("client went away")
+
+
+def append(manager, upload_id, offset, data):
+    return asyncio.run(manager.append(upload_id, offset, chunks_of(data)))
+
+
+def test_upload_in_chunks(tmp_path):
+    completed = []
+    manager = UploadManager(tmp_path, on_complete=completed.append)
+    video = b"lecture video bytes"
+    upload_id = manager.create("intro.mp4", len(video))["upload_id"]
+
+    assert append(manager, upload_id, 0, video[:8])["offset"] == 8
+    with pytest.raises(UploadError) as error:
+        append(manager, upload_id, 4, video[4:])
+    assert error.value.status_code == 409
+
+    record = append(manager, upload_id, 8, video[8:])
+    sha256 = hashlib.sha256(video).hexdigest()
+    assert record["sha256"] == sha256
+    assert record["duplicate"] is False
+    assert record["title"] == "intro"
+    with open(record["path"], "rb") as f:
+        assert f.read() == video
+    assert completed == [manager.get_file(sha256)]
+
+
+def test_resume_after_restart(tmp_path):
+    video = os.urandom(1000)
+    manager = UploadManager(tmp_path)
+    upload_id = manager.create("lecture.mkv", len(video), title="Week 1")["upload_id"]
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(manager.append(upload_id, 0, dropped_after(video[:300], 64)))
+    # The bytes that arrived before the drop are kept
+    assert manager.status(upload_id)["offset"] == 300
+
+    restarted = UploadManager(tmp_path)
+    status = restarted.status(upload_id)
+    assert status["offset"] == 300
+    assert status["title"] == "Week 1"
+    # The hash is rebuilt from the partial file
+    record = append(restarted, upload_id, 300, video[300:])
+    assert record["sha256"] == hashlib.sha256(video).hexdigest()
+    with open(record["path"], "rb") as f:
+        assert f.read() == video
+
+
+def test_duplicate_upload(tmp_path):
+    manager = UploadManager(tmp_path)
+    video = b"same lecture"
+    first = append(manager, manager.create("a.mp4", len(video))["upload_id"], 0, video)
+
+    second = manager.create("b.mp4", len(video))
+    record = append(manager, second["upload_id"], 0, video)
+    assert record["duplicate"] is True
+    assert record["path"] == first["path"]
+    # A client that knows the hash skips the upload altogether
+    assert manager.create("c.mp4", len(video), sha256=first["sha256"])["duplicate"]
+
+
+def test_rejects_chunk_past_declared_size(tmp_path):
+    manager = UploadManager(tmp_path)
+    upload_id = manager.create("a.mp4", 4)["upload_id"]
+    with pytest.raises(UploadError) as error:
+        append(manager, upload_id, 0, b"too long")
+    assert error.value.status_code == 413
+
+
+def test_resume_ingest_requeues_unfinished_files(tmp_path):
+    manager = UploadManager(tmp_path)
+    for video in (b"first", b"second", b"third"):
+        append(manager, manager.create("a.mp4", len(video))["upload_id"], 0, video)
+    ingested, ingesting, uploaded = (
+        hashlib.sha256(video).hexdigest() for video in (b"first", b"second", b"third")
+    )
+    manager.update_file(ingested, status="ingested", lecture_id="abc")
+    manager.update_file(ingesting, status="ingesting")
+
+    requeued = []
+    restarted = UploadManager(tmp_path, on_complete=requeued.append)
+    assert restarted.resume_ingest() == 2
+    assert sorted(record["sha256"] for record in requeued) == sorted(
+        [ingesting, uploaded]
+    )
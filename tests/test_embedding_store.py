@@ -0,0 +1,110 @@
+import glob
+import os
+
+import numpy as np
+
+from evaluation.embedding_store import EmbeddingStore
+
+
+def fake_encode(texts):
+    return np.array([[len(text), text.count("a"), 1.0] for text in texts])
+
+
+def test_round_trip(tmp_path):
+    store = EmbeddingStore("all-MiniLM-L6-v2", root=tmp_path)
+    texts = ["a cat", "a banana", "dog"]
+    store.put_many(texts, fake_encode(texts))
+
+    reopened = EmbeddingStore("all-MiniLM-L6-v2", root=tmp_path)
+    vectors, found = reopened.get_many(["dog", "a cat"])
+    assert found.tolist() == [True, True]
+    np.testing.assert_array_equal(vectors, fake_encode(["dog", "a cat"]))
+    assert len(reopened) == 3
+
+
+def test_float16_round_trip(tmp_path):
+    store = EmbeddingStore("model", root=tmp_path, dtype=np.float16)
+    store.put_many(["a"], [[0.5, 0.25]])
+    vectors, found = EmbeddingStore("model", root=tmp_path, dtype=np.float16).get_many(
+        ["a"]
+    )
+    assert found.all()
+    assert vectors.dtype == np.float16
+    np.testing.assert_array_equal(vectors, [[0.5, 0.25]])
+
+
+def test_lookup_miss(tmp_path):
+    store = EmbeddingStore("model", root=tmp_path)
+    vectors, found = store.get_many(["never stored"])
+    assert vectors is None
+    assert found.tolist() == [False]
+
+    store.put_many(["stored"], fake_encode(["stored"]))
+    vectors, found = store.get_many(["stored", "missing", "zzz"])
+    assert found.tolist() == [True, False, False]
+    np.testing.assert_array_equal(vectors[1:], np.zeros((2, 3)))
+
+
+def test_encode_only_encodes_missing_texts(tmp_path):
+    store = EmbeddingStore("model", root=tmp_path)
+    calls = []
+
+    def encode(texts):
+        calls.append(list(texts))
+        return fake_encode(texts)
+
+    store.encode(["a", "b"], encode)
+    vectors = store.encode(["b", "c", "a"], encode)
+    assert calls == [["a", "b"], ["c"]]
+    np.testing.assert_array_equal(vectors, fake_encode(["b", "c", "a"]))
+
+
+def segment_sizes(store):
+    return [len(keys) for _, keys, _ in store._segments]
+
+
+def test_compaction_keeps_newest_vector(tmp_path):
+    store = EmbeddingStore("model", root=tmp_path)
+    store.put_many(["a", "b"], [[1.0], [2.0]])
+    store.put_many(["b"], [[20.0]])
+    store.put_many(["c"], [[3.0]])
+    store.compact()
+
+    assert len(glob.glob(os.path.join(store.path, "*.keys.npy"))) == 1
+    assert len(glob.glob(os.path.join(store.path, "*.vectors.npy"))) == 1
+    for reader in (store, EmbeddingStore("model", root=tmp_path)):
+        vectors, found = reader.get_many(["a", "b", "c"])
+        assert found.all()
+        np.testing.assert_array_equal(vectors, [[1.0], [20.0], [3.0]])
+        assert len(reader) == 3
+
+
+def test_tiered_compaction_leaves_large_segments_alone(tmp_path):
+    store = EmbeddingStore("model", root=tmp_path, tier_size=4)
+    large = [f"old {i}" for i in range(64)]
+    store.put_many(large, fake_encode(large))
+    large_segment = store._segments[0][0]
+
+    for i in range(3):
+        store.put_many([f"new {i}"], fake_encode([f"new {i}"]))
+    assert segment_sizes(store) == [64, 1, 1, 1]
+    # The fourth small segment merges the small ones into the next tier
+    store.put_many(["new 3"], fake_encode(["new 3"]))
+    assert segment_sizes(store) == [64, 4]
+    assert store._segments[0][0] == large_segment
+
+    texts = large + [f"new {i}" for i in range(4)]
+    vectors, found = EmbeddingStore("model", root=tmp_path).get_many(texts)
+    assert found.all()
+    np.testing.assert_array_equal(vectors, fake_encode(texts))
+    assert len(glob.glob(os.path.join(store.path, "*.keys.npy"))) == 2
+
+
+def test_segment_count_grows_logarithmically(tmp_path):
+    store = EmbeddingStore("model", root=tmp_path, tier_size=4)
+    for i in range(500):
+        store.put_many([str(i)], [[float(i)]])
+    sizes = segment_sizes(store)
+    assert sum(sizes) == 500
+    assert len(sizes) <= 3 * 5
+    assert sizes == sorted(sizes, reverse=True)
@@ -0,0 +1,57 @@
+import pytest
+
+from audio_files.vtt_convert import iter_captions
+
+VTT = """WEBVTT
+
+00:00:01.000 --> 00:00:04.500
+Welcome to the <b>lecture</b>.
+
+00:00:06.000 --> 00:00:09.250
+Today we cover
+entropy.
+
+01:00:00.000 --> 01:00:02.000
+The end."""
+
+SRT = """1
+00:00:01,000 --> 00:00:02,000
+First caption.
+
+2
+00:00:01,500 --> 00:00:03,000
+Overlapping caption.
+"""
+
+
+def test_vtt_captions():
+    captions = list(iter_captions(VTT.splitlines(keepends=True)))
+    assert [caption["sentence"] for caption in captions] == [
+        "Welcome to the lecture.",
+        "Today we cover\nentropy.",
+        "The end.",
+    ]
+    first, second, last = captions
+    assert (first["start"], first["end"], first["duration"]) == (1.0, 4.5, 3.5)
+    assert first["gap"] == 0.0
+    assert second["gap"] == pytest.approx(1.5)
+    assert (last["start"], last["end"]) == (3600.0, 3602.0)
+
+
+def test_srt_captions_with_overlap():
+    captions = list(iter_captions(SRT.splitlines()))
+    assert [caption["sentence"] for caption in captions] == [
+        "First caption.",
+        "Overlapping caption.",
+    ]
+    assert captions[1]["start"] == 1.5
+    # Overlapping captions have no gap rather than a negative one
+    assert captions[1]["gap"] == 0.0
+
+
+def test_reads_path_with_bom(tmp_path):
+    path = tmp_path / "lecture.vtt"
+    path.write_text("\ufeff" + VTT.replace("\n", "\r\n"), encoding="utf-8")
+    captions = list(iter_captions(str(path)))
+    assert len(captions) == 3
+    assert captions[0]["sentence"] == "Welcome to the lecture."
@@ -0,0 +1,411 @@
+"""
+Resumable, chunked uploads of lecture videos.
+
+A client creates an upload with the file's name and size, then sends the
+bytes in order with PUT requests carrying the byte offset they start at. If a
+connection drops, the client asks for the upload's offset and continues from
+there; the bytes that arrived before the drop are kept.
+
+- Chunks are streamed to disk in small buffers, never held whole in memory
+- The sha256 is updated as bytes arrive, so it is ready when the last chunk
+  lands (after a server restart it is rebuilt once from the partial file)
+- Finished files are stored by content hash: a duplicate upload is dropped
+  and returns the existing file's lecture id instead of being analyzed again.
+  A client that sends the sha256 up front skips uploading a known file
+- Upload size, chunk size, open uploads and concurrent chunk writes are
+  all bounded (MAX_UPLOAD_BYTES, MAX_CHUNK_BYTES, MAX_ACTIVE_UPLOADS,
+  MAX_CONCURRENT_WRITES)
+
+Finished uploads are fed to the ingest pipeline (upload/upload.py) in the
+background, and the resulting lecture id is recorded with the file.
+
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+
+from analysis.cache import write_json_atomic
+from vid_to_aud.aud_convert import VIDEO_EXTENSIONS
+
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", "uploads")
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(8 * 1024**3)))
+MAX_CHUNK_BYTES = int(os.environ.get("MAX_CHUNK_BYTES", str(64 * 1024**2)))
+MAX_ACTIVE_UPLOADS = int(os.environ.get("MAX_ACTIVE_UPLOADS", "32"))
+MAX_CONCURRENT_WRITES = int(os.environ.get("MAX_CONCURRENT_WRITES", "8"))
+UPLOAD_TTL_SECONDS = int(os.environ.get("UPLOAD_TTL_SECONDS", str(24 * 3600)))
+
+# Bytes gathered from the request stream before each disk write + hash update
+WRITE_BUFFER_BYTES = 1024 * 1024
+HASH_READ_BYTES = 8 * 1024 * 1024
+
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+
+class UploadError(Exception):
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class UploadSession:
+    def __init__(self, upload_id, filename, size, title, partial_dir, created=None):
+        self.upload_id = upload_id
+        self.filename = filename
+        self.size = size
+        self.title = title
+        self.created = created or time.time()
+        self.updated = self.created
+        self.part_path = os.path.join(partial_dir, f"{upload_id}.part")
+        self.meta_path = os.path.join(partial_dir, f"{upload_id}.json")
+        self.offset = 0
+        self.busy = False
+        self._hasher = hashlib.sha256()
+
+    @classmethod
+    def load(cls, meta_path):
+        meta = _read_json(meta_path)
+        if meta is None:
+            return None
+        session = cls(
+            meta["upload_id"],
+            meta["filename"],
+            meta["size"],
+            meta["title"],
+            os.path.dirname(meta_path),
+            meta["created"],
+        )
+        session.updated = meta["updated"]
+        # Bytes reach the part file before the metadata, so its size wins
+        try:
+            session.offset = os.path.getsize(session.part_path)
+        except OSError:
+            session.offset = 0
+        session._hasher = None
+        return session
+
+    def info(self):
+        return {
+            "upload_id": self.upload_id,
+            "filename": self.filename,
+            "title": self.title,
+            "size": self.size,
+            "offset": self.offset,
+            "status": "uploading",
+        }
+
+    def save(self):
+        write_json_atomic(
+            {
+                "upload_id": self.upload_id,
+                "filename": self.filename,
+                "size": self.size,
+                "title": self.title,
+                "created": self.created,
+                "updated": self.updated,
+            },
+            self.meta_path,
+        )
+
+    def rehash(self):
+        """Rebuilds the running hash from the partial file (after a restart)."""
+        hasher = hashlib.sha256()
+        with open(self.part_path, "ab+") as f:
+            f.seek(0)
+            f.truncate(self.offset)
+            while data := f.read(HASH_READ_BYTES):
+                hasher.update(data)
+        self._hasher = hasher
+
+    def write(self, data):
+        with open(self.part_path, "ab") as f:
+            f.write(data)
+        self._hasher.update(data)
+        self.offset += len(data)
+        self.updated = time.time()
+
+    def hexdigest(self):
+        return self._hasher.hexdigest()
+
+    def remove(self):
+        for path in (self.part_path, self.meta_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class UploadManager:
+    def __init__(
+        self,
+        root=UPLOAD_DIR,
+        max_upload_bytes=MAX_UPLOAD_BYTES,
+        max_chunk_bytes=MAX_CHUNK_BYTES,
+        max_active=MAX_ACTIVE_UPLOADS,
+        max_concurrent_writes=MAX_CONCURRENT_WRITES,
+        ttl_seconds=UPLOAD_TTL_SECONDS,
+        on_complete=None,
+    ):
+        self.root = root
+        self.partial_dir = os.path.join(root, "partial")
+        self.files_dir = os.path.join(root, "files")
+        os.makedirs(self.partial_dir, exist_ok=True)
+        os.makedirs(self.files_dir, exist_ok=True)
+        self.max_upload_bytes = max_upload_bytes
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_active = max_active
+        self.ttl_seconds = ttl_seconds
+        self.on_complete = on_complete
+        self._write_slots = asyncio.Semaphore(max_concurrent_writes)
+        self._records_lock = threading.Lock()
+        self._sessions = {}
+        self._stats = {"bytes_received": 0, "completed": 0, "duplicates": 0}
+        for name in os.listdir(self.partial_dir):
+            if name.endswith(".json"):
+                session = UploadSession.load(os.path.join(self.partial_dir, name))
+                if session is not None:
+                    self._sessions[session.upload_id] = session
+
+    # Finished files live in files/<sha256>/ next to an upload.json record, and
+    # are named by their hash so pipeline outputs never collide
+    def file_dir(self, sha256):
+        return os.path.join(self.files_dir, sha256)
+
+    def get_file(self, sha256):
+        if not _SHA256.match(sha256):
+            return None
+        return _read_json(os.path.join(self.file_dir(sha256), "upload.json"))
+
+    def update_file(self, sha256, **fields):
+        with self._records_lock:
+            record = self.get_file(sha256)
+            if record is None:
+                return None
+            record.update(fields)
+            write_json_atomic(
+                record, os.path.join(self.file_dir(sha256), "upload.json")
+            )
+            return record
+
+    def resume_ingest(self):
+        """Hands files whose ingest never finished (the server stopped while
+        they were queued or being analyzed) back to on_complete."""
+        if self.on_complete is None:
+            return 0
+        resumed = 0
+        for sha256 in os.listdir(self.files_dir):
+            record = self.get_file(sha256)
+            if record is not None and record["status"] in ("uploaded", "ingesting"):
+                self.on_complete(record)
+                resumed += 1
+        return resumed
+
+    def expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        for upload_id, session in list(self._sessions.items()):
+            if not session.busy and session.updated < cutoff:
+                session.remove()
+                del self._sessions[upload_id]
+
+    def create(self, filename, size, title=None, sha256=None):
+        extension = os.path.splitext(filename)[1].lower()
+        if extension not in VIDEO_EXTENSIONS:
+            raise UploadError(415, f"Unsupported video type {extension!r}")
+        if size <= 0:
+            raise UploadError(422, "size must be positive")
+        if size > self.max_upload_bytes:
+            raise UploadError(
+                413, f"Uploads are limited to {self.max_upload_bytes} bytes"
+            )
+        if sha256 is not None:
+            existing = self.get_file(sha256.lower())
+            if existing is not None:
+                return self._duplicate(existing)
+
+        self.expire()
+        if len(self._sessions) >= self.max_active:
+            raise UploadError(429, "Too many uploads in progress")
+        filename = os.path.basename(filename) or "lecture"
+        session = UploadSession(
+            uuid.uuid4().hex,
+            filename,
+            size,
+            title or os.path.splitext(filename)[0],
+            self.partial_dir,
+        )
+        session.save()
+        self._sessions[session.upload_id] = session
+        return session.info()
+
+    def session(self, upload_id):
+        session = self._sessions.get(upload_id)
+        if session is None:
+            raise UploadError(404, f"Unknown upload_id {upload_id}")
+        return session
+
+    def status(self, upload_id):
+        return self.session(upload_id).info()
+
+    async def append(self, upload_id, offset, chunks):
+        """Writes the byte stream `chunks` at `offset` and returns the upload's
+        state; the finished file's record once the last byte has arrived."""
+        session = self.session(upload_id)
+        if session.busy:
+            raise UploadError(409, "Another chunk of this upload is being written")
+        if offset != session.offset:
+            raise UploadError(
+                409, f"Chunk starts at {offset}, upload is at {session.offset}"
+            )
+
+        session.busy = True
+        try:
+            async with self._write_slots:
+                if session._hasher is None:
+                    await asyncio.to_thread(session.rehash)
+                await self._receive(session, chunks)
+            if session.offset == session.size:
+                return await asyncio.to_thread(self._finish, session)
+            return session.info()
+        finally:
+            session.busy = False
+
+    async def _receive(self, session, chunks):
+        received = 0
+        buffer = bytearray()
+        try:
+            async for data in chunks:
+                received += len(data)
+                if received > self.max_chunk_bytes:
+                    raise UploadError(
+                        413, f"Chunks are limited to {self.max_chunk_bytes} bytes"
+                    )
+                if session.offset + len(buffer) + len(data) > session.size:
+                    raise UploadError(413, "Chunk runs past the declared size")
+                buffer += data
+                if len(buffer) >= WRITE_BUFFER_BYTES:
+                    await asyncio.to_thread(session.write, bytes(buffer))
+                    buffer.clear()
+        finally:
+            # Whatever arrived before a disconnect or a rejected piece is kept
+            if buffer:
+                await asyncio.to_thread(session.write, bytes(buffer))
+            self._stats["bytes_received"] += received
+            await asyncio.to_thread(session.save)
+
+    def _finish(self, session):
+        sha256 = session.hexdigest()
+        self._sessions.pop(session.upload_id, None)
+        with self._records_lock:
+            existing = self.get_file(sha256)
+            if existing is None:
+                os.makedirs(self.file_dir(sha256), exist_ok=True)
+                extension = os.path.splitext(session.filename)[1].lower()
+                path = os.path.join(self.file_dir(sha256), sha256 + extension)
+                os.replace(session.part_path, path)
+                record = {
+                    "sha256": sha256,
+                    "filename": session.filename,
+                    "title": session.title,
+                    "size": session.size,
+                    "path": path,
+                    "status": "uploaded",
+                    "lecture_id": None,
+                }
+                write_json_atomic(
+                    record, os.path.join(self.file_dir(sha256), "upload.json")
+                )
+        session.remove()
+        if existing is not None:
+            return self._duplicate(existing)
+
+        self._stats["completed"] += 1
+        if self.on_complete is not None:
+            self.on_complete(record)
+        return {**record, "duplicate": False}
+
+    def _duplicate(self, existing):
+        self._stats["duplicates"] += 1
+        # A file whose analysis failed earlier gets another attempt
+        if existing["status"] == "failed" and self.on_complete is not None:
+            self.on_complete(existing)
+        return {**existing, "duplicate": True}
+
+    def abort(self, upload_id):
+        session = self.session(upload_id)
+        if session.busy:
+            raise UploadError(409, "A chunk of this upload is being written")
+        del self._sessions[upload_id]
+        session.remove()
+
+    def metrics(self):
+        return {
+            **self._stats,
+            "active_uploads": len(self._sessions),
+            "max_active_uploads": self.max_active,
+        }
+
+
+class BackgroundIngest:
+    """Runs finished uploads through the ingest pipeline on a background thread
+    and records each file's lecture id (or error) in its upload record."""
+
+    def __init__(self, manager, store, **pipeline_options):
+        self.manager = manager
+        self.store = store
+        self.pipeline_options = pipeline_options
+        self._uploads = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, record):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="upload-ingest", daemon=True
+                )
+                self._thread.start()
+        self.manager.update_file(record["sha256"], status="ingesting")
+        self._uploads.put((record["path"], record["title"]))
+
+    def _run(self):
+        # Imported here so the API starts without loading the analyzers
+        from upload.upload import IngestPipeline
+
+        options = {"work_dir": os.path.join(self.manager.root, "work")}
+        options.update(self.pipeline_options)
+        pipeline = IngestPipeline(store=self.store, **options)
+        for result in pipeline.run(self._uploads):
+            sha256 = os.path.splitext(os.path.basename(result["source"]))[0]
+            if result["status"] == "failed":
+                self.manager.update_file(
+                    sha256, status="failed", error=result.get("error")
+                )
+            else:
+                self.manager.update_file(
+                    sha256,
+                    status="ingested",
+                    lecture_id=result["lecture_id"],
+                    error=None,
+                )
+
+    def close(self, timeout=None):
+        with self._lock:
+            if self._thread is None:
+                return
+            self._uploads.put(None)
+            self._thread.join(timeout)
@@ -0,0 +1,479 @@
+"""
+Ingest pipeline: video -> audio -> transcript -> analysis -> stored lecture.
+
+Each stage has its own pool of worker threads and a bounded input queue, so a
+slow stage applies back-pressure instead of letting work pile up in memory,
+and each stage can be sized to its own cost:
+
+- extract:    ffmpeg to 16 kHz mono audio (vid_to_aud/aud_convert.py)
+- transcribe: resident WhisperX model (speech_to_text/transcribe.py)
+- analyze:    captions -> transcript -> quality analyzers, in a process pool;
+              pacing comes from the caption timings (analyze_timed_pacing)
+- store:      registers the analysis in the lecture store (lecture_store.py)
+
+Every stage skips work that is already done: audio newer than its video,
+a transcript newer than its audio, analyses already in the analysis cache,
+and lectures already registered (ids are derived from the analysis). Inputs
+can also enter part way through: audio files start at transcribe and
+.vtt/.srt captions (or a .txt transcript with a sibling .vtt) at analyze.
+
+    python -m upload.upload lectures/ -o audio_files --extract-workers 4 --analyze-workers 4
+
+"""
+
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from analysis.analysis import (
+    ANALYZER_NAMES,
+    ANALYZER_VERSIONS,
+    analyze_text,
+    lookup_cached,
+)
+from analysis.cache import DEFAULT_CACHE_DIR, get_cache, make_key, stream_hash
+from audio_files.vtt_convert import iter_captions
+from lecture_store import LECTURE_DB, LECTURE_ID_LENGTH, LectureStore
+from quality.engagement import LEXICON_FILE_ENV
+from quality.pacing import analyze_timed_pacing
+from response_cache import analysis_hash
+from vid_to_aud.aud_convert import (
+    VIDEO_EXTENSIONS,
+    extract_audio,
+    is_up_to_date,
+    output_path_for,
+)
+
+AUDIO_EXTENSIONS = {".wav", ".flac", ".mp3", ".m4a", ".ogg"}
+CAPTION_EXTENSIONS = {".vtt", ".srt"}
+STAGES = ("extract", "transcribe", "analyze", "store")
+
+# Latencies kept per stage for the percentiles
+METRICS_WINDOW = 1000
+
+
+def entry_stage(path):
+    """The first stage a file needs, or None if it is not a supported input."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in VIDEO_EXTENSIONS:
+        return "extract"
+    if extension in AUDIO_EXTENSIONS:
+        return "transcribe"
+    if extension in CAPTION_EXTENSIONS or extension == ".txt":
+        return "analyze"
+    return None
+
+
+def find_inputs(path):
+    if os.path.isfile(path):
+        return [path]
+    return sorted(
+        os.path.join(path, name)
+        for name in os.listdir(path)
+        if entry_stage(name) is not None
+    )
+
+
+def lecture_inputs(paths):
+    """One input per lecture, keyed by file stem: the file that enters the
+    pipeline earliest (video, then audio, then a .txt transcript, then its
+    captions). Later files of the same lecture, such as the .wav and .vtt the
+    pipeline itself writes, are reached through the skipped stages instead."""
+    chosen = {}
+    unsupported = []
+    for path in paths:
+        stage = entry_stage(path)
+        if stage is None:
+            unsupported.append(path)
+            continue
+        name, extension = os.path.splitext(os.path.basename(path))
+        rank = (STAGES.index(stage), extension.lower() != ".txt")
+        if name not in chosen or rank < chosen[name][0]:
+            chosen[name] = (rank, path)
+    return [path for _, path in chosen.values()] + unsupported
+
+
+def read_transcript(job):
+    """`(text, duration)` from the job's captions, or its .txt plus captions."""
+    text = None
+    if job.get("transcript"):
+        with open(job["transcript"], "r", encoding="utf-8") as f:
+            text = f.read()
+
+    sentences = []
+    duration = None
+    if job.get("captions") and os.path.exists(job["captions"]):
+        for caption in iter_captions(job["captions"]):
+            sentences.append(caption["sentence"])
+            duration = caption["end"]
+    if duration is None:
+        raise ValueError("missing duration: no captions for the transcript")
+    return (" ".join(sentences) if text is None else text), duration
+
+
+def timed_pacing_key(captions):
+    with open(captions, "r", encoding="utf-8") as f:
+        return make_key(stream_hash(f), "pac_timed", *ANALYZER_VERSIONS["pac"])
+
+
+def _analyze(text, duration, cache_dir, subject=None, captions=None):
+    # One cache per worker process; building it per lecture rescans the directory
+    cache = get_cache(cache_dir) if cache_dir else None
+    results = analyze_text(text, duration, cache=cache, subject=subject)
+    if captions:
+        # Caption timings give pauses and rate changes, not just the mean rate
+        key = timed_pacing_key(captions) if cache is not None else None
+        timed = cache.get(key) if key else None
+        if timed is None:
+            timed = analyze_timed_pacing(iter_captions(captions))
+            if key:
+                cache.put(key, timed)
+        results["pac"] = timed
+    return results
+
+
+class Stage:
+    def __init__(self, name, fn, workers=1, queue_size=None):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.input = queue.Queue(maxsize=queue_size or workers * 2)
+        self.output = None
+        self.counts = Counter()
+        self.latencies = deque(maxlen=METRICS_WINDOW)
+        self.depth_samples = deque(maxlen=METRICS_WINDOW)
+        self.max_depth = 0
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self, failed):
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, args=(failed,), name=f"{self.name}-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        for _ in self._threads:
+            self.input.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _work(self, failed):
+        while (job := self.input.get()) is not None:
+            depth = self.input.qsize()
+            started = time.perf_counter()
+            try:
+                status = self.fn(job)
+            except Exception as e:
+                status = "failed"
+                job["error"] = f"{self.name}: {type(e).__name__}: {e}"
+            seconds = time.perf_counter() - started
+            job["stages"][self.name] = {"status": status, "seconds": seconds}
+            with self._lock:
+                self.counts[status] += 1
+                self.latencies.append(seconds)
+                self.depth_samples.append(depth)
+                self.max_depth = max(self.max_depth, depth)
+            (failed if status == "failed" else self.output).put(job)
+
+    def metrics(self):
+        with self._lock:
+            latencies = np.array(self.latencies)
+            depths = np.array(self.depth_samples)
+            counts = dict(self.counts)
+            max_depth = self.max_depth
+        latency = {}
+        if len(latencies):
+            latency = {
+                "mean": float(latencies.mean()),
+                "p50": float(np.percentile(latencies, 50)),
+                "p95": float(np.percentile(latencies, 95)),
+                "max": float(latencies.max()),
+            }
+        return {
+            "workers": self.workers,
+            "counts": counts,
+            "latency_seconds": latency,
+            "queue_depth": {
+                "current": self.input.qsize(),
+                "mean": float(depths.mean()) if len(depths) else 0.0,
+                "max": max_depth,
+                "capacity": self.input.maxsize,
+            },
+        }
+
+
+class IngestPipeline:
+    def __init__(
+        self,
+        work_dir="audio_files",
+        audio_format="wav",
+        extract_workers=None,
+        transcribe_workers=1,
+        analyze_workers=None,
+        store_workers=1,
+        queue_size=None,
+        transcriber=None,
+        transcriber_options=None,
+        cache_dir=DEFAULT_CACHE_DIR,
+        store=None,
+        overwrite=False,
+        subject=None,
+    ):
+        cpu_count = os.cpu_count() or 1
+        self.work_dir = work_dir
+        self.audio_format = audio_format
+        self.cache_dir = cache_dir
+        self.cache = get_cache(cache_dir) if cache_dir else None
+        self.overwrite = overwrite
+        self.subject = subject
+        self.store = store
+        self._owns_store = store is None
+        self.transcriber = transcriber
+        self.transcriber_options = transcriber_options or {}
+        self._transcriber_lock = threading.Lock()
+        self._pool = None
+
+        workers = {
+            "extract": extract_workers or max(1, cpu_count // 2),
+            "transcribe": transcribe_workers,
+            "analyze": analyze_workers or max(1, cpu_count // 2),
+            "store": store_workers,
+        }
+        fns = {
+            "extract": self.extract,
+            "transcribe": self.transcribe,
+            "analyze": self.analyze,
+            "store": self.store_lecture,
+        }
+        self.stages = {
+            name: Stage(name, fns[name], workers[name], queue_size) for name in STAGES
+        }
+        for name, next_name in zip(STAGES, STAGES[1:]):
+            self.stages[name].output = self.stages[next_name].input
+        self.results = queue.Queue()
+        self.stages[STAGES[-1]].output = self.results
+
+    def new_job(self, path, title=None):
+        name, extension = os.path.splitext(os.path.basename(path))
+        job = {
+            "source": path,
+            "title": title or name,
+            "status": "pending",
+            "stages": {},
+        }
+        stage = entry_stage(path)
+        if stage == "transcribe":
+            job["audio"] = path
+        elif stage == "analyze":
+            if extension.lower() == ".txt":
+                job["transcript"] = path
+                job["captions"] = os.path.splitext(path)[0] + ".vtt"
+            else:
+                job["captions"] = path
+        return stage, job
+
+    def get_transcriber(self):
+        with self._transcriber_lock:
+            if self.transcriber is None:
+                from speech_to_text.transcribe import TranscriptionWorker
+
+                self.transcriber = TranscriptionWorker(**self.transcriber_options)
+            return self.transcriber
+
+    def extract(self, job):
+        job["audio"] = output_path_for(job["source"], self.work_dir, self.audio_format)
+        result = extract_audio(
+            job["source"], job["audio"], self.audio_format, self.overwrite
+        )
+        if result["status"] == "failed":
+            raise RuntimeError(result["error"])
+        return "skipped" if result["status"] == "skipped" else "done"
+
+    def transcribe(self, job):
+        name = os.path.splitext(os.path.basename(job["audio"]))[0]
+        job["captions"] = os.path.join(self.work_dir, f"{name}.vtt")
+        if not self.overwrite and is_up_to_date(job["audio"], job["captions"]):
+            return "skipped"
+        result = self.get_transcriber().transcribe_file(job["audio"], self.work_dir)
+        job["captions"] = result["vtt"]
+        return "done"
+
+    def analyze(self, job):
+        text, duration = read_transcript(job)
+        job["duration"] = duration
+        # read_transcript only returns when there are captions
+        captions = job["captions"]
+        if self.cache is not None:
+            # Fully cached transcripts never reach the process pool
+            _, cached = lookup_cached(text, duration, self.cache, self.subject)
+            cached.pop("pac", None)
+            timed = self.cache.get(timed_pacing_key(captions))
+            if timed is not None:
+                cached["pac"] = timed
+            if len(cached) == len(ANALYZER_NAMES):
+                job["analysis"] = {name: cached[name] for name in ANALYZER_NAMES}
+                return "skipped"
+        job["analysis"] = self._pool.submit(
+            _analyze, text, duration, self.cache_dir, self.subject, captions
+        ).result()
+        return "done"
+
+    def store_lecture(self, job):
+        lecture_id = analysis_hash(job["analysis"])[:LECTURE_ID_LENGTH]
+        if self.store.get(lecture_id) is not None:
+            job["lecture_id"] = lecture_id
+            return "skipped"
+        job["lecture_id"] = self.store.add(job["analysis"], title=job["title"])
+        return "done"
+
+    def run(self, paths):
+        """Pushes every path through the pipeline, yielding one result per path
+        in completion order. `paths` is an iterable or a queue.Queue ended with
+        None; an item can also be a `(path, title)` pair."""
+        if isinstance(paths, queue.Queue):
+            paths = iter(paths.get, None)
+        if self.store is None:
+            self.store = LectureStore()
+        # Workers start lazily, from an analyze thread, while the other stage
+        # threads run; spawning avoids forking a multi-threaded process
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.stages["analyze"].workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        for stage in self.stages.values():
+            stage.start(self.results)
+
+        submitted = 0
+        feeding = True
+        feeder_error = []
+
+        def feed():
+            nonlocal submitted, feeding
+            try:
+                for item in paths:
+                    path, title = item if isinstance(item, tuple) else (item, None)
+                    stage, job = self.new_job(path, title)
+                    job["started"] = time.perf_counter()
+                    submitted += 1
+                    if stage is None:
+                        job["error"] = "unsupported input"
+                        self.results.put(job)
+                    else:
+                        self.stages[stage].input.put(job)
+            except Exception as e:
+                feeder_error.append(e)
+            finally:
+                feeding = False
+                self.results.put(None)
+
+        feeder = threading.Thread(target=feed, name="ingest-feeder", daemon=True)
+        feeder.start()
+        finished = 0
+        try:
+            while feeding or finished < submitted:
+                job = self.results.get()
+                if job is None:
+                    continue
+                finished += 1
+                job["status"] = "failed" if "error" in job else "stored"
+                job["seconds"] = time.perf_counter() - job.pop("started")
+                job.pop("analysis", None)
+                yield job
+        finally:
+            feeder.join()
+            for stage in self.stages.values():
+                stage.stop()
+            self._pool.shutdown()
+            if self._owns_store:
+                self.store.close()
+                self.store = None
+        if feeder_error:
+            raise feeder_error[0]
+
+    def metrics(self):
+        return {name: stage.metrics() for name, stage in self.stages.items()}
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ingest lectures end to end.")
+    parser.add_argument(
+        "inputs", nargs="+", help="Videos, audio, captions or directories of them"
+    )
+    parser.add_argument("-o", "--work-dir", default="audio_files")
+    parser.add_argument("--format", choices=["wav", "flac"], default="wav")
+    parser.add_argument("--extract-workers", type=int)
+    parser.add_argument("--transcribe-workers", type=int, default=1)
+    parser.add_argument("--analyze-workers", type=int)
+    parser.add_argument("--store-workers", type=int, default=1)
+    parser.add_argument("--queue-size", type=int)
+    parser.add_argument("--whisper-model")
+    parser.add_argument("--device")
+    parser.add_argument("--compute-type")
+    parser.add_argument("--language")
+    parser.add_argument("--chunk-workers", type=int, default=1)
+    parser.add_argument("--no-align", action="store_true")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--db", default=LECTURE_DB)
+    parser.add_argument("--overwrite", action="store_true")
+    parser.add_argument("--subject", help="subject for the engagement phrases")
+    parser.add_argument(
+        "--lexicon",
+        help="JSON file of subject engagement phrases (SUBJECT_LEXICON_FILE)",
+    )
+    args = parser.parse_args()
+    if args.lexicon:
+        # Set before the worker pools start, so they inherit it
+        os.environ[LEXICON_FILE_ENV] = os.path.abspath(args.lexicon)
+
+    transcriber_options = {
+        "device": args.device,
+        "compute_type": args.compute_type,
+        "language": args.language,
+        "workers": args.chunk_workers,
+        "align": not args.no_align,
+    }
+    if args.whisper_model:
+        transcriber_options["model_name"] = args.whisper_model
+
+    pipeline = IngestPipeline(
+        args.work_dir,
+        args.format,
+        extract_workers=args.extract_workers,
+        transcribe_workers=args.transcribe_workers,
+        analyze_workers=args.analyze_workers,
+        store_workers=args.store_workers,
+        queue_size=args.queue_size,
+        transcriber_options=transcriber_options,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        store=LectureStore(args.db),
+        overwrite=args.overwrite,
+        subject=args.subject,
+    )
+    paths = lecture_inputs(
+        path for source in args.inputs for path in find_inputs(source)
+    )
+    failed = 0
+    for result in pipeline.run(paths):
+        failed += result["status"] == "failed"
+        print(json.dumps(result))
+    print(json.dumps({"metrics": pipeline.metrics()}))
+    pipeline.store.close()
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,179 @@
-from pydub import AudioSegment
+"""
+Video to audio extraction with ffmpeg.
+
+ffmpeg decodes and resamples the audio track as a stream and writes it
+straight to disk, so memory stays flat however long the lecture is. The
+batch extractor runs a pool of ffmpeg processes over a queue of videos,
+skips outputs that are newer than their video, and yields one result dict
+per file.
+
+    python vid_to_aud/aud_convert.py lectures/ -o audio/ --format flac --workers 4
+
+"""
+
+import json
 import os
+import queue
+import subprocess
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+FFMPEG_BINARY = os.environ.get("FFMPEG_BINARY", "ffmpeg")
+WHISPER_SAMPLE_RATE = 16000
+VIDEO_EXTENSIONS = {".mp4", ".mkv", ".mov", ".avi", ".webm", ".m4v", ".flv"}
+
+# Encoder per output format
+AUDIO_CODECS = {
+    "wav": "pcm_s16le",
+    "flac": "flac",
+    "mp3": "libmp3lame",
+}
+
+
+def _run_ffmpeg(input_path, output_path, audio_format, sample_rate=None, channels=None):
+    """Writes the first audio track of `input_path` to `output_path` atomically."""
+    args = [FFMPEG_BINARY, "-nostdin", "-hide_banner", "-loglevel", "error"]
+    args += ["-i", input_path, "-map", "0:a:0", "-vn"]
+    if channels is not None:
+        args += ["-ac", str(channels)]
+    if sample_rate is not None:
+        args += ["-ar", str(sample_rate)]
+    args += ["-c:a", AUDIO_CODECS[audio_format], "-f", audio_format]
+
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(output_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, suffix=f".{audio_format}.tmp")
+    os.close(fd)
+    try:
+        subprocess.run(
+            args + ["-y", tmp_path],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
 
 def video_to_audio(video_path, output_audio_path, audio_format="mp3"):
     try:
-        audio = AudioSegment.from_file(video_path)
-        audio.export(output_audio_path, format=audio_format)
+        _run_ffmpeg(video_path, output_audio_path, audio_format)
         print(f"Conversion successful! Audio saved at: {output_audio_path}")
+    except subprocess.CalledProcessError as e:
+        print(f"Error: {e.stderr.decode(errors='replace').strip()}")
     except Exception as e:
         print(f"Error: {e}")
 
 
-video_path = "lec_6.mp4"  
-output_audio_path = "output_audio.mp3"  
+def is_up_to_date(source_path, output_path):
+    try:
+        return os.path.getmtime(output_path) >= os.path.getmtime(source_path)
+    except OSError:
+        return False
+
+
+def output_path_for(video_path, output_dir, audio_format):
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    return os.path.join(output_dir, f"{name}.{audio_format}")
+
+
+def extract_audio(video_path, audio_path, audio_format="wav", overwrite=False):
+    """Mono 16 kHz audio for Whisper. Returns a result dict instead of raising."""
+    result = {"video": video_path, "audio": audio_path, "status": "skipped"}
+    started = time.perf_counter()
+    if overwrite or not is_up_to_date(video_path, audio_path):
+        try:
+            _run_ffmpeg(
+                video_path,
+                audio_path,
+                audio_format,
+                sample_rate=WHISPER_SAMPLE_RATE,
+                channels=1,
+            )
+            result["status"] = "converted"
+        except subprocess.CalledProcessError as e:
+            result["status"] = "failed"
+            result["error"] = e.stderr.decode(errors="replace").strip()
+        except OSError as e:
+            result["status"] = "failed"
+            result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def _iter_jobs(videos):
+    """Videos from an iterable, or from a queue.Queue until a None sentinel."""
+    if isinstance(videos, queue.Queue):
+        while (video := videos.get()) is not None:
+            yield video
+    else:
+        yield from videos
+
+
+def extract_batch(
+    videos,
+    output_dir,
+    audio_format="wav",
+    workers=None,
+    overwrite=False,
+    max_pending=None,
+):
+    """Extracts audio for many videos in parallel, yielding results as they finish.
+
+    `videos` is an iterable of paths or a queue.Queue ended with None. At most
+    `max_pending` files are in flight, so an unbounded queue is fine.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for video in _iter_jobs(videos):
+            audio = output_path_for(video, output_dir, audio_format)
+            pending.add(
+                pool.submit(extract_audio, video, audio, audio_format, overwrite)
+            )
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
+
+
+def find_videos(path):
+    if os.path.isfile(path):
+        return [path]
+    return sorted(
+        os.path.join(path, name)
+        for name in os.listdir(path)
+        if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS
+    )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extract Whisper-ready audio.")
+    parser.add_argument("inputs", nargs="+", help="Video files or directories")
+    parser.add_argument("-o", "--output-dir", default="audio_files")
+    parser.add_argument("--format", choices=["wav", "flac"], default="wav")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--overwrite", action="store_true")
+    args = parser.parse_args()
+
+    videos = [video for path in args.inputs for video in find_videos(path)]
+    failed = 0
+    for result in extract_batch(
+        videos, args.output_dir, args.format, args.workers, args.overwrite
+    ):
+        failed += result["status"] == "failed"
+        print(json.dumps(result))
+    raise SystemExit(1 if failed else 0)
+
 
-# video_to_audio(video_path, output_audio_path)
+if __name__ == "__main__":
+    main()